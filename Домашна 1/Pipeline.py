@@ -1,33 +1,72 @@
 from filters import filter1, filter2, filter3
+from database import typed_storage
+from database.bars import sync_bars
+from database.columnar import sync_store
+from database.storage import get_storage
+import argparse
 import time
 
 
+def print_fetch_stats(stats):
+    print(f"  {stats.requests} requests, {stats.rows} rows, {stats.cache_hits} pages read from the local cache")
+    if stats.skipped_chunks:
+        print(f"  skipped {stats.skipped_chunks} chunks already committed by an earlier run")
+    print(f"  fetch time: {stats.fetch_time:.2f} seconds (summed over requests)")
+    print(f"  parse time: {stats.parse_time:.2f} seconds (summed over parser workers)")
+    print(f"  achieved {stats.request_rate():.1f} requests/second, final concurrency {stats.final_limit or 0:.1f}")
+    print(f"  {stats.retries} retries, {stats.hedged} hedged requests, {stats.failed_chunks} failed chunks")
+    print(f"  latency p50 {stats.latency_percentile(0.5):.3f}s, p95 {stats.latency_percentile(0.95):.3f}s, "
+          f"p99 {stats.latency_percentile(0.99):.3f}s\n")
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Fetch and store historical data from the Macedonian Stock Exchange.")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted backfill, fetching only chunks that were not committed")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="download every page instead of reusing cached mse.mk responses")
+    args = parser.parse_args()
+
     total_start_time = time.time()
 
+    if typed_storage.needs_migration(filter2.DB_PATH):
+        print("Migrating historical_data to typed numeric columns...")
+        typed_storage.migrate(filter2.DB_PATH)
+        print()
+
     # Run filter1
     print("Running filter1...")
     start_time = time.time()
-    filter1.fetch_issuers()
+    filter1.fetch_issuers(use_cache=not args.no_cache)
     end_time = time.time()
     print(f"filter1 completed in {end_time - start_time:.2f} seconds.\n")
 
     # Run filter2
     print("Running filter2...")
     start_time = time.time()
-    filter2.main()
+    stats = filter2.main(resume=args.resume, use_cache=not args.no_cache)
     end_time = time.time()
-    print(f"filter2 completed in {end_time - start_time:.2f} seconds.\n")
+    print(f"filter2 completed in {end_time - start_time:.2f} seconds.")
+    print_fetch_stats(stats)
 
     # Run filter3
     print("Running filter3...")
     start_time = time.time()
-    filter3.main()
+    stats = filter3.main(use_cache=not args.no_cache)
     end_time = time.time()
-    print(f"filter3 completed in {end_time - start_time:.2f} seconds.\n")
+    print(f"filter3 completed in {end_time - start_time:.2f} seconds.")
+    print_fetch_stats(stats)
+
+    # Bring the memory-mapped copy used by the analyzers up to date
+    sync_store(filter2.DB_PATH)
+    # and fold the new rows into the weekly and monthly bars
+    sync_bars(filter2.DB_PATH)
 
     total_end_time = time.time()
     print(f"Pipeline completed in {total_end_time - total_start_time:.2f} seconds.")
+    storage_stats = get_storage(filter2.DB_PATH).stats
+    print(f"SQLite: {storage_stats.connections_opened} connections opened, "
+          f"{storage_stats.queries} queries in {storage_stats.query_time:.2f} seconds")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,134 @@
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from database.bars import BAR_AGGREGATIONS, BAR_RULES, clear_bars, open_bars, update_bars
+from database.panel import load_panel
+
+CREATE_HISTORICAL_DATA = '''
+CREATE TABLE historical_data (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    issuer_code TEXT NOT NULL,
+    date TEXT,
+    last_price REAL,
+    max_price REAL,
+    min_price REAL,
+    avg_price REAL,
+    percent_change REAL,
+    quantity INTEGER,
+    turnover_best REAL,
+    total_turnover REAL,
+    UNIQUE(issuer_code, date)
+)
+'''
+INSERT_ROW = ("INSERT INTO historical_data (issuer_code, date, last_price, max_price, min_price, avg_price, quantity) "
+              "VALUES (?, ?, ?, ?, ?, ?, ?)")
+
+
+def synthetic_rows(issuers, days, rng):
+    """Random-walk prices for every issuer on the last `days` business days, with a few NULL prices."""
+    dates = pd.bdate_range(end="2026-10-16", periods=days).strftime("%Y-%m-%d")
+    rows = []
+    for i in range(issuers):
+        close = 1000 + np.cumsum(rng.normal(0, 5, days))
+        spread = np.abs(rng.normal(0, 3, days))
+        last = [None if rng.random() < 0.005 else price for price in close.tolist()]
+        rows.extend(zip([f"I{i:04d}"] * days, dates, last, (close + spread).tolist(), (close - spread).tolist(),
+                        close.tolist(), rng.integers(0, 500, days).tolist()))
+    return rows
+
+
+def previous_bars(panel):
+    # What the analyzers did on every run: resample each issuer's whole daily history
+    columns = {name: name for name in BAR_AGGREGATIONS}
+    bars = {}
+    for timeframe, rule in BAR_RULES.items():
+        for issuer_code in panel.issuers:
+            data = panel.frame(issuer_code, columns)
+            data[list(columns)] = data[list(columns)].fillna(0.0)
+            bars[timeframe, issuer_code] = data.resample(rule, on="date").agg(BAR_AGGREGATIONS).dropna()
+    return bars
+
+
+def stored_bars(db_path):
+    panels = open_bars(db_path)
+    columns = {name: name for name in BAR_AGGREGATIONS}
+    return {(timeframe, issuer_code): panel.frame(issuer_code, columns).set_index("date")
+            for timeframe, panel in panels.items() for issuer_code in panel.issuers}
+
+
+def measure(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start_time)
+    return result, best
+
+
+def same_bars(current, baseline):
+    if sorted(current) != sorted(baseline):
+        return False
+    for key, bars in baseline.items():
+        try:
+            pd.testing.assert_frame_equal(current[key], bars, check_exact=True, check_freq=False, check_names=False)
+        except AssertionError:
+            return False
+    return True
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compare reading stored weekly and monthly bars with "
+                                                     "resampling the daily history, and time keeping them current.")
+    arg_parser.add_argument("--issuers", type=int, default=300)
+    arg_parser.add_argument("--days", type=int, default=2500, help="trading days of history per issuer")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    rows = synthetic_rows(args.issuers, args.days, np.random.default_rng(0))
+    last_day = rows[-1][1]
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "bars.db")
+        with sqlite3.connect(db_path) as conn:
+            conn.execute(CREATE_HISTORICAL_DATA)
+            conn.executemany(INSERT_ROW, [row for row in rows if row[1] != last_day])
+
+        start_time = time.perf_counter()
+        update_bars(db_path)
+        build_time = time.perf_counter() - start_time
+        with sqlite3.connect(db_path) as conn:
+            conn.executemany(INSERT_ROW, [row for row in rows if row[1] == last_day])
+        start_time = time.perf_counter()
+        update_bars(db_path)
+        append_time = time.perf_counter() - start_time
+
+        baseline, baseline_time = measure(lambda: previous_bars(load_panel(db_path)), args.repeat)
+        current, current_time = measure(lambda: stored_bars(db_path), args.repeat)
+        clear_bars(db_path)
+        update_bars(db_path)
+        rebuilt = stored_bars(db_path)
+
+    print(f"{args.issuers} issuers, {len(rows)} daily rows")
+    print(f"{'step':<44}{'seconds':>10}")
+    print(f"{'first aggregation of the whole table':<44}{build_time:>10.3f}")
+    print(f"{'update after one new trading day':<44}{append_time:>10.3f}")
+    print(f"{'analyzer: load and resample daily history':<44}{baseline_time:>10.3f}")
+    print(f"{'analyzer: read stored bars':<44}{current_time:>10.3f}")
+    print(f"Speed-up for the analyzer: {baseline_time / current_time:.1f}x")
+
+    if not same_bars(current, baseline) or not same_bars(current, rebuilt):
+        print("MISMATCH: stored bars differ from resampling the daily rows")
+        return 1
+    print("Stored bars, kept current incrementally, equal the resampled daily history.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from database.typed_storage import parse_session_date, typed_values
+from filters.filter2 import sort_and_format_data
+
+
+def previous_sort_and_format_data(issuer_data):
+    """sort_and_format_data before memoised dates: strptime/strftime per row, then a sort per issuer group."""
+    formatted_data = []
+    for record in issuer_data:
+        issuer_code, date_str, *other_data = record
+        date_obj = datetime.strptime(date_str, "%m/%d/%Y")
+        formatted_date = date_obj.strftime("%Y-%m-%d")
+        formatted_data.append((issuer_code, formatted_date, *typed_values(other_data)))
+    formatted_data.sort(key=lambda x: (x[0], x[1]))
+    sorted_data = []
+    current_issuer = None
+    issuer_group = []
+    for record in formatted_data:
+        issuer_code, date_str, *other_data = record
+        if issuer_code != current_issuer:
+            if issuer_group:
+                is_sorted = all(
+                    issuer_group[i][1] >= issuer_group[i + 1][1]
+                    for i in range(len(issuer_group) - 1)
+                )
+                if not is_sorted:
+                    issuer_group.sort(key=lambda x: x[1], reverse=True)
+                sorted_data.extend(issuer_group)
+            issuer_group = [(issuer_code, date_str, *other_data)]
+            current_issuer = issuer_code
+        else:
+            issuer_group.append((issuer_code, date_str, *other_data))
+    if issuer_group:
+        is_sorted = all(
+            issuer_group[i][1] >= issuer_group[i + 1][1]
+            for i in range(len(issuer_group) - 1)
+        )
+        if not is_sorted:
+            issuer_group.sort(key=lambda x: x[1], reverse=True)
+        sorted_data.extend(issuer_group)
+    return sorted_data
+
+
+def synthetic_backfill(issuers, years):
+    """Rows as the parser returns them: newest first within each fetched chunk, chunks in any order."""
+    end_date = date(2024, 12, 31)
+    sessions = [end_date - timedelta(days=offset) for offset in range(365 * years)]
+    sessions = [day for day in sessions if day.weekday() < 5]
+    rows = []
+    for issuer_index in range(issuers):
+        issuer_code = f"ISS{issuer_index:03d}"
+        chunks = [sessions[i:i + 240] for i in range(0, len(sessions), 240)]
+        random.shuffle(chunks)
+        for chunk in chunks:
+            for day in chunk:
+                price = f"{1000 + day.toordinal() % 500}.00"
+                rows.append((issuer_code, f"{day.month}/{day.day}/{day.year}", price, price, price, price,
+                             "0.00", "100", "100000", "100000"))
+    return rows
+
+
+def measure(function, rows, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        parse_session_date.cache_clear()
+        start_time = time.perf_counter()
+        result = function(rows)
+        best = min(best, time.perf_counter() - start_time)
+    return result, best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compare sort_and_format_data with its per-row predecessor.")
+    arg_parser.add_argument("--issuers", type=int, default=100)
+    arg_parser.add_argument("--years", type=int, default=10)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    random.seed(0)
+    rows = synthetic_backfill(args.issuers, args.years)
+    baseline, baseline_time = measure(previous_sort_and_format_data, rows, args.repeat)
+    current, current_time = measure(sort_and_format_data, rows, args.repeat)
+
+    print(f"{len(rows)} rows, {len({row[1] for row in rows})} distinct dates, {args.issuers} issuers")
+    print(f"{'implementation':<30}{'seconds':>10}{'rows/second':>14}")
+    print(f"{'per-row strptime + regroup':<30}{baseline_time:>10.3f}{len(rows) / baseline_time:>14,.0f}")
+    print(f"{'memoised dates + one sort':<30}{current_time:>10.3f}{len(rows) / current_time:>14,.0f}")
+    print(f"Speed-up: {baseline_time / current_time:.1f}x")
+
+    if current != baseline:
+        print("MISMATCH: the two implementations returned different rows or order")
+        return 1
+    print("Both implementations returned identical rows in identical order.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from database.typed_storage import decode_number, decode_numbers
+
+
+def legacy_column(rows, missing_share):
+    """Values as version 0/1 databases stored them: "21.600,00" display text, some parser output, some empty."""
+    values = []
+    for _ in range(rows):
+        draw = random.random()
+        if draw < missing_share:
+            values.append(random.choice(["", None]))
+        elif draw < missing_share + 0.05:
+            values.append(f"{random.uniform(1, 50000):.2f}")
+        else:
+            whole, cents = divmod(round(random.lognormvariate(7, 2) * 100), 100)
+            values.append(f"{whole:,}".replace(",", ".") + f",{cents:02d}")
+    return values
+
+
+def per_value(values):
+    return np.array([np.nan if (number := decode_number(value)) is None else number for value in values],
+                    dtype=np.float64)
+
+
+def measure(function, values, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = function(values)
+        best = min(best, time.perf_counter() - start_time)
+    return result, best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compare decode_numbers with decode_number called per value.")
+    arg_parser.add_argument("--rows", type=int, default=1000000)
+    arg_parser.add_argument("--missing", type=float, default=0.02, help="share of empty or NULL values")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    random.seed(0)
+    values = legacy_column(args.rows, args.missing)
+    baseline, baseline_time = measure(per_value, values, args.repeat)
+    current, current_time = measure(decode_numbers, values, args.repeat)
+
+    print(f"{len(values)} values, {args.missing:.0%} empty or NULL")
+    print(f"{'implementation':<30}{'seconds':>10}{'values/second':>16}")
+    print(f"{'decode_number per value':<30}{baseline_time:>10.3f}{len(values) / baseline_time:>16,.0f}")
+    print(f"{'decode_numbers per column':<30}{current_time:>10.3f}{len(values) / current_time:>16,.0f}")
+    print(f"Speed-up: {baseline_time / current_time:.1f}x")
+
+    if not np.array_equal(current, baseline, equal_nan=True):
+        print("MISMATCH: the two implementations decoded different values")
+        return 1
+    print("Both implementations decoded identical values.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
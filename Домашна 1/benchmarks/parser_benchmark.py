@@ -0,0 +1,93 @@
+import argparse
+import glob
+import os
+import sys
+import time
+import tracemalloc
+
+import requests
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from filters.fetch_engine import BASE_URL, HEADERS, get_date_ranges, parse_data_from_html
+from filters.results_table import parse_results_table
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+
+def record_corpus(corpus_dir, issuer_codes, start_date, end_date):
+    os.makedirs(corpus_dir, exist_ok=True)
+    for issuer_code in issuer_codes:
+        for start_date_range, end_date_range in get_date_ranges(start_date, end_date):
+            response = requests.get(BASE_URL.format(issuer_code),
+                                    params={"FromDate": start_date_range.replace("-", "/"),
+                                            "ToDate": end_date_range.replace("-", "/")},
+                                    headers=HEADERS)
+            if response.status_code == 200:
+                path = os.path.join(corpus_dir, f"{issuer_code}_{start_date_range}_{end_date_range}.html")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(response.text)
+    print(f"Recorded pages into {corpus_dir}")
+
+
+def load_corpus(corpus_dir):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(corpus_dir, "*.html"))):
+        issuer_code = os.path.basename(path).split("_")[0]
+        with open(path, encoding="utf-8") as f:
+            pages.append((issuer_code, f.read()))
+    return pages
+
+
+def run_parser(parse, pages, repeat):
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        results = [parse(html_content, issuer_code) for issuer_code, html_content in pages]
+    elapsed = time.perf_counter() - start_time
+    rows = sum(len(result) for result in results) * repeat
+
+    # Memory is measured in a separate pass so tracing does not skew the timing.
+    tracemalloc.start()
+    for issuer_code, html_content in pages:
+        parse(html_content, issuer_code)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return results, rows / elapsed if elapsed else 0.0, peak_memory
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compare the BeautifulSoup and streaming resultsTable parsers.")
+    arg_parser.add_argument("--corpus", default=CORPUS_DIR, help="directory of recorded symbol-history pages")
+    arg_parser.add_argument("--record", nargs="*", metavar="ISSUER", help="download pages for these issuers first")
+    arg_parser.add_argument("--from-date", default="01-01-2015", help="first date to record (mm-dd-YYYY)")
+    arg_parser.add_argument("--to-date", default="12-31-2024", help="last date to record (mm-dd-YYYY)")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    if args.record:
+        record_corpus(args.corpus, args.record, args.from_date, args.to_date)
+
+    pages = load_corpus(args.corpus)
+    if not pages:
+        print(f"No recorded pages in {args.corpus}. Record some with --record ALK KMB ...")
+        return 1
+
+    baseline, baseline_rate, baseline_memory = run_parser(parse_data_from_html, pages, args.repeat)
+    fast, fast_rate, fast_memory = run_parser(parse_results_table, pages, args.repeat)
+
+    print(f"{len(pages)} pages, {sum(len(result) for result in baseline)} rows")
+    print(f"{'parser':<22}{'rows/second':>14}{'peak memory (KiB)':>20}")
+    print(f"{'BeautifulSoup':<22}{baseline_rate:>14,.0f}{baseline_memory / 1024:>20,.1f}")
+    print(f"{'parse_results_table':<22}{fast_rate:>14,.0f}{fast_memory / 1024:>20,.1f}")
+    if baseline_rate:
+        print(f"Speed-up: {fast_rate / baseline_rate:.1f}x")
+
+    if fast != baseline:
+        mismatched = sum(1 for a, b in zip(baseline, fast) if a != b)
+        print(f"MISMATCH: {mismatched} pages parsed differently")
+        return 1
+    print("Both parsers returned identical tuples for every page.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from .columnar import last_row_id
+from .panel import OHLCVPanel
+from .storage import DB_PATH, get_storage
+
+# Weekly and monthly bars, stored next to historical_data so the analyzers read
+# them instead of resampling every issuer's whole daily history on every run.
+# A bar is what resample(rule).agg(BAR_AGGREGATIONS) gives for one period of an
+# issuer's daily rows, with NULLs counted as 0 as the technical analysis reads
+# them; rows is how many daily rows it covers and missing how many of those had
+# a NULL, so a reader that treats gaps differently can tell which bars it may use.
+# bar_sync holds the last historical_data id folded into each timeframe.
+BAR_RULES = {"W": "W", "M": "ME"}
+PERIOD_FREQS = {"W": "W", "M": "M"}
+BAR_AGGREGATIONS = {
+    "last_price": "last",
+    "max_price": "max",
+    "min_price": "min",
+    "avg_price": "mean",
+    "quantity": "sum",
+}
+BAR_COLUMNS = tuple(BAR_AGGREGATIONS) + ("rows", "missing")
+
+CREATE_BARS = '''
+CREATE TABLE IF NOT EXISTS bars (
+    issuer_code TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    date TEXT NOT NULL,
+    last_price REAL,
+    max_price REAL,
+    min_price REAL,
+    avg_price REAL,
+    quantity REAL,
+    rows INTEGER NOT NULL,
+    missing INTEGER NOT NULL,
+    PRIMARY KEY (issuer_code, timeframe, date)
+)
+'''
+
+CREATE_BAR_SYNC = '''
+CREATE TABLE IF NOT EXISTS bar_sync (
+    timeframe TEXT PRIMARY KEY,
+    synced_id INTEGER NOT NULL
+)
+'''
+
+CREATE_BAR_PERIODS = '''
+CREATE TEMP TABLE IF NOT EXISTS bar_periods (
+    issuer_code TEXT NOT NULL,
+    first_day TEXT NOT NULL,
+    last_day TEXT NOT NULL,
+    PRIMARY KEY (issuer_code, first_day)
+)
+'''
+
+INSERT_BAR = (f"INSERT INTO bars (issuer_code, timeframe, date, {', '.join(BAR_COLUMNS)}) "
+              f"VALUES (?, ?, ?{', ?' * len(BAR_COLUMNS)})")
+
+UPSERT_SYNC = '''
+INSERT INTO bar_sync (timeframe, synced_id) VALUES (?, ?)
+ON CONFLICT (timeframe) DO UPDATE SET synced_id = excluded.synced_id
+'''
+
+
+def create_tables(storage):
+    with storage.transaction() as conn:
+        conn.execute(CREATE_BARS)
+        conn.execute(CREATE_BAR_SYNC)
+
+
+def synced_ids(db_path=DB_PATH):
+    """{timeframe: last historical_data id folded into its bars}."""
+    storage = get_storage(db_path)
+    create_tables(storage)
+    synced = dict(storage.query("SELECT timeframe, synced_id FROM bar_sync"))
+    return {timeframe: synced.get(timeframe, 0) for timeframe in BAR_RULES}
+
+
+def period_bounds(dates, timeframe):
+    """(first day, last day) of the period each ISO date falls in, as ISO text."""
+    periods = pd.DatetimeIndex(dates).to_period(PERIOD_FREQS[timeframe])
+    return periods.start_time.strftime("%Y-%m-%d"), periods.end_time.strftime("%Y-%m-%d")
+
+
+def aggregate(daily, timeframe):
+    """Bars of daily rows (issuer_code, date, BAR_AGGREGATIONS columns) ordered by issuer and date."""
+    columns = list(BAR_AGGREGATIONS)
+    values = daily[columns].astype("float64")
+    daily = daily.assign(date=pd.to_datetime(daily["date"]), missing=values.isna().any(axis=1).astype("int64"))
+    daily[columns] = values.fillna(0.0)
+    grouped = daily.groupby(["issuer_code", pd.Grouper(key="date", freq=BAR_RULES[timeframe])])
+    bars = grouped.agg(**{name: (name, how) for name, how in BAR_AGGREGATIONS.items()},
+                       rows=("missing", "size"), missing=("missing", "sum"))
+    # The groupby also yields the empty periods between an issuer's rows; resample(...).dropna() drops them
+    return bars[bars["rows"] > 0].reset_index()
+
+
+def update_timeframe(storage, timeframe, synced_id, last_id):
+    # Re-aggregate every (issuer, period) holding a row with an id in
+    # (synced_id, last_id]: new days of trading only reopen the current week
+    # and month, a refetched gap the periods it falls in. The bar of a period
+    # is labelled with its last day, so it falls inside the period too.
+    # Returns the number of bars written.
+    new_rows = storage.query("SELECT DISTINCT issuer_code, date FROM historical_data "
+                             "WHERE id > ? AND id <= ? AND date IS NOT NULL", (synced_id, last_id))
+    with storage.transaction() as conn:
+        conn.execute(CREATE_BAR_PERIODS)
+        conn.execute("DELETE FROM bar_periods")
+        if new_rows:
+            issuers, dates = zip(*new_rows)
+            first_days, last_days = period_bounds(dates, timeframe)
+            touched = pd.DataFrame({"issuer_code": issuers, "first_day": first_days, "last_day": last_days})
+            conn.executemany("INSERT INTO bar_periods (issuer_code, first_day, last_day) VALUES (?, ?, ?)",
+                             touched.drop_duplicates().itertuples(index=False, name=None))
+        # bar_periods drives the join, so each period is one range of the (issuer_code, date) index
+        daily = pd.read_sql_query(
+            f"SELECT h.issuer_code, h.date, {', '.join(f'h.{name}' for name in BAR_AGGREGATIONS)} "
+            "FROM bar_periods p CROSS JOIN historical_data h ON h.issuer_code = p.issuer_code "
+            "AND h.date BETWEEN p.first_day AND p.last_day WHERE h.id <= ? ORDER BY h.issuer_code, h.date",
+            conn, params=(last_id,))
+        bars = aggregate(daily, timeframe)
+
+        conn.execute("DELETE FROM bars WHERE timeframe = ? AND EXISTS (SELECT 1 FROM bar_periods p "
+                     "WHERE p.issuer_code = bars.issuer_code AND bars.date BETWEEN p.first_day AND p.last_day)",
+                     (timeframe,))
+        rows = zip(bars["issuer_code"], [timeframe] * len(bars), bars["date"].dt.strftime("%Y-%m-%d"),
+                   *(bars[name].astype("float64").tolist() for name in BAR_AGGREGATIONS),
+                   bars["rows"].tolist(), bars["missing"].tolist())
+        conn.executemany(INSERT_BAR, rows)
+        conn.execute(UPSERT_SYNC, (timeframe, last_id))
+    return len(bars)
+
+
+def update_bars(db_path=DB_PATH):
+    """Fold rows inserted into historical_data since the last update into the bars. Returns bars written."""
+    storage = get_storage(db_path)
+    last_id = last_row_id(db_path)
+    written = 0
+    for timeframe, synced_id in synced_ids(db_path).items():
+        if synced_id > last_id:
+            # historical_data was recreated since the last update; start over.
+            clear_bars(db_path, timeframe)
+            synced_id = 0
+        if synced_id < last_id:
+            written += update_timeframe(storage, timeframe, synced_id, last_id)
+    return written
+
+
+def clear_bars(db_path=DB_PATH, timeframe=None):
+    storage = get_storage(db_path)
+    create_tables(storage)
+    with storage.transaction() as conn:
+        for timeframe in BAR_RULES if timeframe is None else (timeframe,):
+            conn.execute("DELETE FROM bars WHERE timeframe = ?", (timeframe,))
+            conn.execute("DELETE FROM bar_sync WHERE timeframe = ?", (timeframe,))
+
+
+def load_bars(timeframe, db_path=DB_PATH):
+    """One timeframe's bars as an OHLCVPanel: rows ordered by (issuer_code, date), each dated by its period end."""
+    rows = get_storage(db_path).query(f"SELECT issuer_code, date, {', '.join(BAR_COLUMNS)} FROM bars "
+                                      "WHERE timeframe = ? ORDER BY issuer_code, date", (timeframe,))
+
+    columns = list(zip(*rows)) or [()] * (len(BAR_COLUMNS) + 2)
+    issuer_codes = np.array(columns[0], dtype=object)
+    dates = np.array(columns[1], dtype="datetime64[D]")
+    values = {name: np.array(column, dtype=np.float64) for name, column in zip(BAR_COLUMNS, columns[2:])}
+    if rows:
+        starts = np.flatnonzero(np.r_[True, issuer_codes[1:] != issuer_codes[:-1]])
+    else:
+        starts = np.empty(0, dtype=np.int64)
+    return OHLCVPanel(issuer_codes[starts], np.r_[starts, len(rows)], dates, values)
+
+
+def open_bars(db_path=DB_PATH, synced_id=None):
+    """{timeframe: bars panel} when the bars hold exactly the historical_data rows up to synced_id.
+
+    synced_id defaults to the table's last row. Returns None when the bars are
+    behind or ahead of it; the caller then resamples the daily rows itself.
+    """
+    synced_id = last_row_id(db_path) if synced_id is None else synced_id
+    if any(bars_id != synced_id for bars_id in synced_ids(db_path).values()):
+        return None
+    return {timeframe: load_bars(timeframe, db_path) for timeframe in BAR_RULES}
+
+
+def sync_bars(db_path=DB_PATH):
+    start_time = time.time()
+    written = update_bars(db_path)
+    print(f"Bars: re-aggregated {written} weekly and monthly bars in {time.time() - start_time:.2f} seconds.")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the weekly and monthly bars of historical_data.")
+    parser.add_argument("--db", default=DB_PATH, help="path of the SQLite database")
+    parser.add_argument("--rebuild", action="store_true", help="aggregate the whole table again")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        clear_bars(args.db)
+    sync_bars(args.db)
+    counts = dict(get_storage(args.db).query("SELECT timeframe, COUNT(*) FROM bars GROUP BY timeframe"))
+    print(", ".join(f"{counts.get(timeframe, 0)} {timeframe} bars" for timeframe in BAR_RULES))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from .panel import PANEL_COLUMNS, load_panel
+from .storage import DB_PATH, get_storage
+
+STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "columnar")
+INDEX_FILE = "index.json"
+
+# Compaction rewrites the files issuer-contiguous once appends have split the
+# issuers into this many segments each on average.
+COMPACT_SEGMENTS_PER_ISSUER = 8
+
+
+def last_row_id(db_path):
+    return get_storage(db_path).query("SELECT COALESCE(MAX(id), 0) FROM historical_data")[0][0]
+
+
+def field_dtype(field):
+    return np.dtype("datetime64[D]") if field == "date" else np.dtype(np.float64)
+
+
+class ColumnarStore:
+    """historical_data as one flat file per field, read through numpy.memmap.
+
+    Every field (date as datetime64[D] i.e. int64 days, the rest float64) is a
+    contiguous array on disk; index.json maps each issuer to the [start, end)
+    row segments that belong to it. sync_from_db appends newly inserted rows as
+    new segments without rewriting anything; compact() rewrites a new file
+    generation with one date-ordered segment per issuer and switches the index
+    to it. An issuer with one segment is served as zero-copy memmap views.
+
+    Exposes the same issuers / slice / frame interface as OHLCVPanel, so the
+    analyzers accept either.
+    """
+
+    def __init__(self, path=STORE_DIR, fields=PANEL_COLUMNS):
+        self.path = path
+        self.fields = ("date",) + tuple(fields)
+        self.index = self.read_index()
+        self.maps = None
+
+    @classmethod
+    def open(cls, path=STORE_DIR):
+        """The store at path, or None when the pipeline has not written one yet."""
+        if not os.path.exists(os.path.join(path, INDEX_FILE)):
+            return None
+        with open(os.path.join(path, INDEX_FILE)) as f:
+            fields = tuple(json.load(f)["fields"])[1:]
+        return cls(path, fields)
+
+    def read_index(self):
+        try:
+            with open(os.path.join(self.path, INDEX_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"generation": 0, "rows": 0, "synced_id": 0, "fields": list(self.fields), "issuers": {}}
+
+    def write_index(self):
+        os.makedirs(self.path, exist_ok=True)
+        temp_path = os.path.join(self.path, INDEX_FILE + ".tmp")
+        with open(temp_path, "w") as f:
+            json.dump(self.index, f)
+        os.replace(temp_path, os.path.join(self.path, INDEX_FILE))
+        self.maps = None
+
+    def generation_dir(self, generation=None):
+        generation = self.index["generation"] if generation is None else generation
+        return os.path.join(self.path, f"gen-{generation}")
+
+    def field_path(self, field, generation=None):
+        return os.path.join(self.generation_dir(generation), f"{field}.bin")
+
+    @property
+    def issuers(self):
+        return list(self.index["issuers"])
+
+    @property
+    def rows(self):
+        return self.index["rows"]
+
+    def __len__(self):
+        return len(self.index["issuers"])
+
+    def __contains__(self, issuer_code):
+        return issuer_code in self.index["issuers"]
+
+    def __iter__(self):
+        return iter(self.issuers)
+
+    def columns(self):
+        if self.maps is None:
+            rows = self.index["rows"]
+            self.maps = {field: np.memmap(self.field_path(field), dtype=field_dtype(field), mode="r", shape=(rows,))
+                         if rows else np.empty(0, dtype=field_dtype(field))
+                         for field in self.fields}
+        return self.maps
+
+    def segments(self, issuer_code):
+        return self.index["issuers"][issuer_code]["segments"]
+
+    def slice(self, issuer_code):
+        """{"date": ..., field: ...} for one issuer, ordered by date.
+
+        Zero-copy memmap views after compaction; appended segments are
+        concatenated (and re-sorted if a gap refetch added older dates).
+        """
+        columns = self.columns()
+        segments = self.segments(issuer_code)
+        if len(segments) == 1:
+            start, end = segments[0]
+            return {field: columns[field][start:end] for field in self.fields}
+        data = {field: np.concatenate([columns[field][start:end] for start, end in segments])
+                for field in self.fields}
+        if np.any(data["date"][1:] < data["date"][:-1]):
+            order = np.argsort(data["date"], kind="stable")
+            data = {field: values[order] for field, values in data.items()}
+        return data
+
+    def frame(self, issuer_code, columns=None):
+        """One issuer as a DataFrame; columns maps store field -> frame column name."""
+        columns = columns or {field: field for field in self.fields[1:]}
+        data = self.slice(issuer_code)
+        frame_data = {"date": data["date"].astype("datetime64[ns]")}
+        frame_data.update({frame_name: np.asarray(data[field]) for field, frame_name in columns.items()})
+        return pd.DataFrame(frame_data)
+
+    def append_panel(self, panel, synced_id):
+        """Append every issuer of an OHLCVPanel as a new segment at the end of each file."""
+        os.makedirs(self.generation_dir(), exist_ok=True)
+        rows = self.index["rows"]
+        for field in self.fields:
+            values = panel.dates if field == "date" else panel.columns[field]
+            with open(self.field_path(field), "r+b" if os.path.exists(self.field_path(field)) else "wb") as f:
+                # Bytes past the indexed rows belong to an append that never committed its index.
+                f.truncate(rows * field_dtype(field).itemsize)
+                f.seek(0, os.SEEK_END)
+                f.write(np.ascontiguousarray(values, dtype=field_dtype(field)).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+        for i, issuer_code in enumerate(panel.issuers):
+            start, end = int(panel.offsets[i]) + rows, int(panel.offsets[i + 1]) + rows
+            entry = self.index["issuers"].setdefault(issuer_code, {"segments": [], "last_date": None})
+            entry["segments"].append([start, end])
+            last_date = str(panel.dates[end - rows - 1])
+            entry["last_date"] = max(entry["last_date"] or last_date, last_date)
+        self.index["rows"] = rows + panel.rows
+        self.index["synced_id"] = synced_id
+        self.write_index()
+
+    def sync_from_db(self, db_path=DB_PATH):
+        """Append rows inserted into historical_data since the last sync. Returns the number of rows added."""
+        synced_id = self.index["synced_id"]
+        last_id = last_row_id(db_path)
+        if last_id < synced_id:
+            # The table was recreated since the last sync; start over.
+            return self.rebuild(db_path)
+        if last_id == synced_id:
+            return 0
+        panel = load_panel(db_path, self.fields[1:], id_range=(synced_id, last_id))
+        self.append_panel(panel, last_id)
+        if self.needs_compaction():
+            self.compact()
+        return panel.rows
+
+    def is_synced_with(self, db_path=DB_PATH):
+        return self.index["synced_id"] == last_row_id(db_path)
+
+    def needs_compaction(self):
+        issuers = self.index["issuers"]
+        segments = sum(len(entry["segments"]) for entry in issuers.values())
+        return segments > COMPACT_SEGMENTS_PER_ISSUER * max(1, len(issuers))
+
+    def compact(self):
+        """Rewrite all fields into a new generation with one date-ordered segment per issuer."""
+        old_generation = self.index["generation"]
+        new_generation = old_generation + 1
+        new_dir = self.generation_dir(new_generation)
+        shutil.rmtree(new_dir, ignore_errors=True)
+        os.makedirs(new_dir)
+
+        new_issuers = {}
+        files = {field: open(self.field_path(field, new_generation), "wb") for field in self.fields}
+        try:
+            position = 0
+            for issuer_code in sorted(self.index["issuers"]):
+                data = self.slice(issuer_code)
+                for field in self.fields:
+                    files[field].write(np.ascontiguousarray(data[field], dtype=field_dtype(field)).tobytes())
+                length = len(data["date"])
+                new_issuers[issuer_code] = {"segments": [[position, position + length]],
+                                            "last_date": self.index["issuers"][issuer_code]["last_date"]}
+                position += length
+        finally:
+            for f in files.values():
+                f.flush()
+                os.fsync(f.fileno())
+                f.close()
+
+        self.maps = None
+        self.index.update(generation=new_generation, rows=position, issuers=new_issuers)
+        self.write_index()
+        shutil.rmtree(self.generation_dir(old_generation), ignore_errors=True)
+
+    def rebuild(self, db_path=DB_PATH):
+        """Drop the store and write it again from the whole historical_data table."""
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.index = {"generation": 0, "rows": 0, "synced_id": 0, "fields": list(self.fields), "issuers": {}}
+        self.maps = None
+        return self.sync_from_db(db_path)
+
+
+def open_history(db_path=DB_PATH, path=STORE_DIR):
+    """The columnar store when it is current with db_path, otherwise a freshly loaded OHLCVPanel."""
+    store = ColumnarStore.open(path)
+    if store is not None and store.is_synced_with(db_path):
+        return store
+    return load_panel(db_path)
+
+
+def sync_store(db_path=DB_PATH, path=STORE_DIR):
+    start_time = time.time()
+    store = ColumnarStore(path)
+    added = store.sync_from_db(db_path)
+    print(f"Columnar store: appended {added} rows for {len(store)} issuers "
+          f"in {time.time() - start_time:.2f} seconds ({store.rows} rows total).")
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the memory-mapped columnar copy of historical_data.")
+    parser.add_argument("--db", default=DB_PATH, help="path of the SQLite database")
+    parser.add_argument("--store", default=STORE_DIR, help="directory of the columnar store")
+    parser.add_argument("--rebuild", action="store_true", help="rewrite the store from the whole table")
+    parser.add_argument("--compact", action="store_true", help="merge appended segments per issuer")
+    args = parser.parse_args()
+
+    store = ColumnarStore(args.store)
+    if args.rebuild:
+        store.rebuild(args.db)
+    else:
+        store.sync_from_db(args.db)
+    if args.compact:
+        store.compact()
+    print(f"Columnar store: {store.rows} rows for {len(store)} issuers in {store.generation_dir()}")
+
+
+if __name__ == "__main__":
+    main()
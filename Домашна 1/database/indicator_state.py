@@ -0,0 +1,54 @@
+import json
+
+from .storage import DB_PATH, get_storage
+
+# Streaming indicator state, one row per issuer, timeframe and indicator set.
+# last_date/rows are the daily bars already folded into state: the last one's
+# date and how many there were, so a refetch that inserts older rows (the
+# count up to last_date changes) is detected and the state rebuilt.
+CREATE_INDICATOR_STATE = '''
+CREATE TABLE IF NOT EXISTS indicator_state (
+    issuer_code TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    indicator_set TEXT NOT NULL,
+    last_date TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (issuer_code, timeframe, indicator_set)
+)
+'''
+
+UPSERT_STATE = '''
+INSERT INTO indicator_state (issuer_code, timeframe, indicator_set, last_date, rows, state)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (issuer_code, timeframe, indicator_set) DO UPDATE SET
+    last_date = excluded.last_date,
+    rows = excluded.rows,
+    state = excluded.state
+'''
+
+
+def load_states(indicator_set, db_path=DB_PATH):
+    """{(issuer_code, timeframe): (last_date, rows, state)} for one indicator set."""
+    storage = get_storage(db_path)
+    storage.execute(CREATE_INDICATOR_STATE)
+    rows = storage.query("SELECT issuer_code, timeframe, last_date, rows, state FROM indicator_state "
+                         "WHERE indicator_set = ?", (indicator_set,))
+    return {(issuer_code, timeframe): (last_date, count, json.loads(state))
+            for issuer_code, timeframe, last_date, count, state in rows}
+
+
+def save_states(indicator_set, states, db_path=DB_PATH):
+    """Write {(issuer_code, timeframe): (last_date, rows, state)} in one transaction."""
+    storage = get_storage(db_path)
+    with storage.transaction() as conn:
+        conn.execute(CREATE_INDICATOR_STATE)
+        conn.executemany(UPSERT_STATE, [(issuer_code, timeframe, indicator_set, last_date, count, json.dumps(state))
+                                        for (issuer_code, timeframe), (last_date, count, state) in states.items()])
+
+
+def clear_states(indicator_set, db_path=DB_PATH):
+    storage = get_storage(db_path)
+    with storage.transaction() as conn:
+        conn.execute(CREATE_INDICATOR_STATE)
+        conn.execute("DELETE FROM indicator_state WHERE indicator_set = ?", (indicator_set,))
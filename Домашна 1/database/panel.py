@@ -0,0 +1,102 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from .storage import DB_PATH, get_storage
+
+PANEL_COLUMNS = ("last_price", "max_price", "min_price", "avg_price", "quantity",
+                 "percent_change", "turnover_best", "total_turnover")
+LOAD_BATCH_SIZE = 50000
+
+
+class OHLCVPanel:
+    """historical_data for many issuers as contiguous NumPy columns.
+
+    Rows are ordered by (issuer_code, date), so every issuer owns the slice
+    offsets[i]:offsets[i + 1] of each column; per-issuer access returns views
+    into those arrays rather than copies or new queries.
+    """
+
+    def __init__(self, issuers, offsets, dates, columns):
+        self.issuers = list(issuers)
+        self.offsets = offsets
+        self.dates = dates
+        self.columns = columns
+        self.positions = {issuer_code: i for i, issuer_code in enumerate(self.issuers)}
+
+    def __len__(self):
+        return len(self.issuers)
+
+    def __contains__(self, issuer_code):
+        return issuer_code in self.positions
+
+    def __iter__(self):
+        return iter(self.issuers)
+
+    @property
+    def rows(self):
+        return len(self.dates)
+
+    def bounds(self, issuer_code):
+        i = self.positions[issuer_code]
+        return self.offsets[i], self.offsets[i + 1]
+
+    def slice(self, issuer_code):
+        """{"date": datetime64[D] view, column: float64 view, ...} for one issuer."""
+        start, end = self.bounds(issuer_code)
+        columns = {name: values[start:end] for name, values in self.columns.items()}
+        columns["date"] = self.dates[start:end]
+        return columns
+
+    def frame(self, issuer_code, columns=None):
+        """One issuer as a DataFrame; columns maps panel column -> frame column name."""
+        columns = columns or {name: name for name in self.columns}
+        start, end = self.bounds(issuer_code)
+        data = {"date": self.dates[start:end].astype("datetime64[ns]")}
+        data.update({frame_name: self.columns[name][start:end] for name, frame_name in columns.items()})
+        return pd.DataFrame(data)
+
+
+def load_panel(db_path=DB_PATH, columns=PANEL_COLUMNS, batch_size=LOAD_BATCH_SIZE, id_range=None):
+    """Read historical_data in one ordered pass into an OHLCVPanel.
+
+    id_range=(after_id, last_id) limits the pass to rows with after_id < id <= last_id,
+    which is how the columnar store picks up only newly inserted rows.
+    """
+    storage = get_storage(db_path)
+    after_id, last_id = id_range or (0, 2 ** 63 - 1)
+    where = "WHERE date IS NOT NULL AND id > ? AND id <= ?"
+    total = storage.query(f"SELECT COUNT(*) FROM historical_data {where}", (after_id, last_id))[0][0]
+    values = {name: np.empty(total, dtype=np.float64) for name in columns}
+    dates = np.empty(total, dtype="datetime64[D]")
+    issuer_codes = np.empty(total, dtype=object)
+
+    start_time = time.perf_counter()
+    cursor = storage.connection().execute(
+        f"SELECT issuer_code, date, {', '.join(columns)} FROM historical_data "
+        f"{where} ORDER BY issuer_code, date", (after_id, last_id))
+    position = 0
+    # Rows committed after the COUNT are left for the next load.
+    while position < total:
+        batch = cursor.fetchmany(min(batch_size, total - position))
+        if not batch:
+            break
+        end = position + len(batch)
+        batch_columns = list(zip(*batch))
+        issuer_codes[position:end] = batch_columns[0]
+        dates[position:end] = np.array(batch_columns[1], dtype="datetime64[D]")
+        for name, column in zip(columns, batch_columns[2:]):
+            # NULLs become NaN here, in bulk, instead of per cell in the analyzers.
+            values[name][position:end] = np.array(column, dtype=np.float64)
+        position = end
+    storage.stats.record(time.perf_counter() - start_time)
+
+    issuer_codes, dates = issuer_codes[:position], dates[:position]
+    values = {name: column[:position] for name, column in values.items()}
+    if position:
+        starts = np.flatnonzero(np.r_[True, issuer_codes[1:] != issuer_codes[:-1]])
+    else:
+        starts = np.empty(0, dtype=np.int64)
+    offsets = np.r_[starts, position]
+    return OHLCVPanel(issuer_codes[starts], offsets, dates, values)
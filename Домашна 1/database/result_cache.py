@@ -0,0 +1,156 @@
+import argparse
+import hashlib
+import os
+import pickle
+import sqlite3
+import time
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "result_cache")
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+
+CREATE_RESULTS = '''
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    issuer_code TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    version TEXT NOT NULL,
+    last_date TEXT,
+    rows INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    last_used REAL NOT NULL
+)
+'''
+
+
+def result_key(issuer_code, timeframe, version, last_date, rows):
+    return hashlib.sha256(f"{issuer_code}|{timeframe}|{version}|{last_date}|{rows}".encode("utf-8")).hexdigest()
+
+
+def version_tag(name, definition):
+    """name plus a digest of an indicator set's definition, so changing an indicator invalidates its results."""
+    return f"{name}-{hashlib.sha256(repr(definition).encode('utf-8')).hexdigest()[:12]}"
+
+
+class ResultCache:
+    """On-disk cache of analysis results per issuer and timeframe.
+
+    An entry is keyed by (issuer_code, timeframe, indicator-set version, last
+    bar date, row count): while an issuer gets no new rows its key stays the
+    same and the stored result is reused; once its watermark moves the lookup
+    misses, the result is recomputed and replaces the superseded entry. Values
+    are pickled to one file each; when they exceed max_bytes the least
+    recently used entries are evicted.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(cache_dir, "index.db"), timeout=60, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(CREATE_RESULTS)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def object_path(self, key):
+        return os.path.join(self.cache_dir, "objects", key[:2], f"{key}.pkl")
+
+    def get(self, issuer_code, timeframe, version, last_date, rows):
+        """The stored result for this watermark, or None."""
+        key = result_key(issuer_code, timeframe, version, last_date, rows)
+        try:
+            with open(self.object_path(key), "rb") as f:
+                value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            self.conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            self.misses += 1
+            return None
+        self.conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.hits += 1
+        return value
+
+    def put(self, issuer_code, timeframe, version, last_date, rows, value):
+        key = result_key(issuer_code, timeframe, version, last_date, rows)
+        body = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        path = self.object_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(body)
+        os.replace(temp_path, path)
+
+        # Results for an older watermark of the same issuer and timeframe can never be hit again.
+        superseded = self.conn.execute("SELECT key FROM results WHERE issuer_code = ? AND timeframe = ? "
+                                       "AND version = ? AND key != ?",
+                                       (issuer_code, timeframe, version, key)).fetchall()
+        self.remove([row[0] for row in superseded])
+        now = time.time()
+        self.conn.execute("INSERT OR REPLACE INTO results "
+                          "(key, issuer_code, timeframe, version, last_date, rows, size, stored_at, last_used) "
+                          "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                          (key, issuer_code, timeframe, version, last_date, rows, len(body), now, now))
+        if self.total_bytes() > self.max_bytes:
+            self.evict()
+
+    def total_bytes(self):
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def remove(self, keys):
+        self.conn.executemany("DELETE FROM results WHERE key = ?", [(key,) for key in keys])
+        for key in keys:
+            try:
+                os.remove(self.object_path(key))
+            except FileNotFoundError:
+                pass
+
+    def evict(self, target=None):
+        target = self.max_bytes * 0.9 if target is None else target
+        total = self.total_bytes()
+        evicted = []
+        for key, size in self.conn.execute("SELECT key, size FROM results ORDER BY last_used").fetchall():
+            if total <= target:
+                break
+            evicted.append(key)
+            total -= size
+        self.remove(evicted)
+        self.evictions += len(evicted)
+
+    def clear(self):
+        self.remove([row[0] for row in self.conn.execute("SELECT key FROM results").fetchall()])
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        rate = 100 * self.hits / lookups if lookups else 0.0
+        return (f"{self.hits} hits, {self.misses} misses ({rate:.0f}% hit rate), {self.evictions} evicted, "
+                f"{self.total_bytes() / 1024 / 1024:.1f} MiB stored")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the analysis result cache.")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--clear", action="store_true", help="remove every cached result")
+    args = parser.parse_args()
+
+    with ResultCache(args.cache_dir) as cache:
+        if args.clear:
+            cache.clear()
+        entries = cache.conn.execute("SELECT COUNT(*), COUNT(DISTINCT issuer_code) FROM results").fetchone()
+        print(f"Result cache: {entries[0]} results for {entries[1]} issuers, "
+              f"{cache.total_bytes() / 1024 / 1024:.1f} MiB in {args.cache_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,24 +13,98 @@ CREATE TABLE IF NOT EXISTS issuers (
 )
 ''')
 
-# Create table for historical data
+# Create table for historical data: numbers are stored typed (REAL/INTEGER)
+# and dates as ISO text; display formatting happens where data is shown.
+new_database = cursor.execute(
+    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'historical_data'").fetchone() is None
 cursor.execute('''
 CREATE TABLE IF NOT EXISTS historical_data (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     issuer_code TEXT NOT NULL,
     date TEXT,
-    last_price TEXT,
-    max_price TEXT,
-    min_price TEXT,
-    avg_price TEXT,
-    percent_change TEXT,
-    quantity TEXT,
-    turnover_best TEXT,
-    total_turnover TEXT,
+    last_price REAL,
+    max_price REAL,
+    min_price REAL,
+    avg_price REAL,
+    percent_change REAL,
+    quantity INTEGER,
+    turnover_best REAL,
+    total_turnover REAL,
     FOREIGN KEY (issuer_code) REFERENCES issuers (code),
     UNIQUE(issuer_code, date)
 )
 ''')
+if new_database:
+    # Existing TEXT tables are converted by database/typed_storage.py instead.
+    cursor.execute("PRAGMA user_version = 2")
+
+# Create table for the backfill checkpoint journal (one row per fetched chunk)
+cursor.execute('''
+CREATE TABLE IF NOT EXISTS fetch_checkpoints (
+    issuer_code TEXT NOT NULL,
+    from_date TEXT NOT NULL,
+    to_date TEXT NOT NULL,
+    status TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (issuer_code, from_date, to_date)
+)
+''')
+
+# Create table for exchange closures learned from refetched gaps
+cursor.execute('''
+CREATE TABLE IF NOT EXISTS non_trading_days (
+    date TEXT PRIMARY KEY
+)
+''')
+
+# Create table for the last session each issuer was fetched up to (see filters/filter3.py)
+cursor.execute('''
+CREATE TABLE IF NOT EXISTS issuer_checks (
+    issuer_code TEXT PRIMARY KEY,
+    checked_through TEXT NOT NULL
+)
+''')
+
+# Create table for streaming indicator state (see database/indicator_state.py)
+cursor.execute('''
+CREATE TABLE IF NOT EXISTS indicator_state (
+    issuer_code TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    indicator_set TEXT NOT NULL,
+    last_date TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (issuer_code, timeframe, indicator_set)
+)
+''')
+
+# Create tables for the weekly and monthly bars (see database/bars.py)
+cursor.execute('''
+CREATE TABLE IF NOT EXISTS bars (
+    issuer_code TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    date TEXT NOT NULL,
+    last_price REAL,
+    max_price REAL,
+    min_price REAL,
+    avg_price REAL,
+    quantity REAL,
+    rows INTEGER NOT NULL,
+    missing INTEGER NOT NULL,
+    PRIMARY KEY (issuer_code, timeframe, date)
+)
+''')
+cursor.execute('''
+CREATE TABLE IF NOT EXISTS bar_sync (
+    timeframe TEXT PRIMARY KEY,
+    synced_id INTEGER NOT NULL
+)
+''')
+
+# Index used by the per-issuer last-date snapshot and date-ordered reads
+cursor.execute('''
+CREATE INDEX IF NOT EXISTS idx_issuer_code_date ON historical_data (issuer_code, date DESC)
+''')
 
 # Commit changes and close the connection
 conn.commit()
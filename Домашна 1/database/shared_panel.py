@@ -0,0 +1,92 @@
+import os
+import secrets
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from .panel import OHLCVPanel
+
+
+class SharedPanel:
+    """An issuer panel copied once into shared memory for worker processes.
+
+    Two blocks hold every row, issuers back to back: the dates as
+    datetime64[D] and the numeric columns as one float64 array with a row per
+    column, so each column stays contiguous. spec (block names, issuers,
+    offsets, columns) is all a worker needs to attach; it pickles in a few
+    kilobytes whatever the panel's size, and the attached panel is an
+    OHLCVPanel whose arrays are views into the blocks, so nothing is copied.
+
+    The process that created the panel unlinks the blocks; workers only close
+    them. Every view into the blocks must be dropped before close().
+    """
+
+    def __init__(self, spec, blocks, owner=False):
+        self.spec = spec
+        self.blocks = blocks
+        self.owner = owner
+        rows = spec["rows"]
+        dates = np.ndarray((rows,), dtype="datetime64[D]", buffer=blocks[0].buf)
+        values = np.ndarray((len(spec["columns"]), rows), dtype=np.float64, buffer=blocks[1].buf)
+        self.panel = OHLCVPanel(spec["issuers"], np.asarray(spec["offsets"], dtype=np.int64), dates,
+                                dict(zip(spec["columns"], values)))
+
+    @classmethod
+    def create(cls, panel, issuers=None, columns=None):
+        """Copy issuers (default: all) of an OHLCVPanel or ColumnarStore into new shared memory blocks."""
+        issuers = [issuer_code for issuer_code in (panel.issuers if issuers is None else issuers)
+                   if issuer_code in panel]
+        slices = [panel.slice(issuer_code) for issuer_code in issuers]
+        if columns is None:
+            columns = [name for name in slices[0] if name != "date"] if slices else []
+        offsets = np.r_[0, np.cumsum([len(data["date"]) for data in slices])].astype(np.int64)
+        rows = int(offsets[-1])
+
+        prefix = f"panel-{secrets.token_hex(6)}"
+        # A zero-sized block is an error, so an empty panel still gets one byte
+        sizes = (max(rows * 8, 1), max(rows * len(columns) * 8, 1))
+        blocks = [shared_memory.SharedMemory(name=f"{prefix}-{part}", create=True, size=size)
+                  for part, size in zip(("dates", "values"), sizes)]
+        spec = {"blocks": [block.name for block in blocks], "issuers": issuers, "offsets": offsets.tolist(),
+                "columns": list(columns), "rows": rows}
+        shared = cls(spec, blocks, owner=True)
+        for data, start, end in zip(slices, offsets[:-1], offsets[1:]):
+            shared.panel.dates[start:end] = data["date"]
+            for name in columns:
+                shared.panel.columns[name][start:end] = data[name]
+        return shared
+
+    @classmethod
+    def attach(cls, spec):
+        # Attaching registers the blocks with this process's resource tracker.
+        # Workers started by multiprocessing, whatever the start method, share
+        # the tracker of the process that created the blocks, which holds them
+        # already; unregistering there would drop the owner's registration. Any
+        # other process starts a tracker of its own, which would report the
+        # blocks as leaked and unlink them when the process exits, so they are
+        # unregistered from it again.
+        own_tracker = os.name == "posix" and resource_tracker._resource_tracker._fd is None
+        blocks = [shared_memory.SharedMemory(name=name) for name in spec["blocks"]]
+        if own_tracker:
+            for block in blocks:
+                resource_tracker.unregister(block._name, "shared_memory")
+        return cls(spec, blocks)
+
+    @property
+    def nbytes(self):
+        return sum(block.size for block in self.blocks)
+
+    def close(self):
+        self.panel = None
+        for block in self.blocks:
+            block.close()
+        if self.owner:
+            for block in self.blocks:
+                block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
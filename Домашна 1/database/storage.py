@@ -0,0 +1,140 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "macedonian_stock_exchange.db")
+
+# Applied to every pooled connection. WAL lets the analyzers read while the
+# fetch pipeline writes; synchronous=NORMAL is durable under WAL except for
+# the last commits before a power loss; the page cache and memory map keep the
+# historical_data pages hot across the many per-issuer queries of a run.
+BUSY_TIMEOUT_MS = 60000
+CACHE_SIZE_KIB = 64 * 1024
+MMAP_SIZE = 256 * 1024 * 1024
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    f"PRAGMA cache_size=-{CACHE_SIZE_KIB}",
+    f"PRAGMA mmap_size={MMAP_SIZE}",
+    "PRAGMA temp_store=MEMORY",
+)
+
+# sqlite3 keeps this many prepared statements per connection, keyed by SQL
+# text, so queries repeated per issuer are compiled once per thread.
+STATEMENT_CACHE_SIZE = 256
+
+
+class StorageStats:
+    def __init__(self):
+        self.connections_opened = 0
+        self.queries = 0
+        self.query_time = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, elapsed):
+        with self.lock:
+            self.queries += 1
+            self.query_time += elapsed
+
+
+class Storage:
+    """Per-thread pooled connections to one SQLite database.
+
+    Each thread (and each process, after a fork) gets one connection, opened
+    on first use with the tuned pragmas and kept for the life of the Storage,
+    instead of a connect/close around every query.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self.stats = StorageStats()
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000,
+                                   cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False)
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            self.local.conn, self.local.pid = conn, os.getpid()
+            with self.lock:
+                self.connections.append(conn)
+                self.stats.connections_opened += 1
+        return conn
+
+    def execute(self, sql, params=()):
+        start_time = time.perf_counter()
+        try:
+            return self.connection().execute(sql, params)
+        finally:
+            self.stats.record(time.perf_counter() - start_time)
+
+    def executemany(self, sql, rows):
+        start_time = time.perf_counter()
+        try:
+            return self.connection().executemany(sql, rows)
+        finally:
+            self.stats.record(time.perf_counter() - start_time)
+
+    def query(self, sql, params=()):
+        start_time = time.perf_counter()
+        try:
+            return self.connection().execute(sql, params).fetchall()
+        finally:
+            self.stats.record(time.perf_counter() - start_time)
+
+    def read_frame(self, sql, params=()):
+        import pandas as pd
+
+        start_time = time.perf_counter()
+        try:
+            return pd.read_sql_query(sql, self.connection(), params=params)
+        finally:
+            self.stats.record(time.perf_counter() - start_time)
+
+    @contextmanager
+    def transaction(self):
+        """Commits on success, rolls back on error: `with storage.transaction() as conn: ...`."""
+        conn = self.connection()
+        with conn:
+            yield conn
+
+    def release(self):
+        """Close the calling thread's connection, e.g. when a worker thread finishes."""
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            self.local.conn = None
+            with self.lock:
+                if conn in self.connections:
+                    self.connections.remove(conn)
+            conn.close()
+
+    def close(self):
+        with self.lock:
+            connections, self.connections = self.connections, []
+        for conn in connections:
+            conn.close()
+        self.local = threading.local()
+
+
+storages = {}
+storages_lock = threading.Lock()
+
+
+def get_storage(db_path=DB_PATH):
+    """The shared Storage for db_path; every pipeline that imports this module reuses it."""
+    key = os.path.abspath(db_path)
+    with storages_lock:
+        if key not in storages:
+            storages[key] = Storage(db_path)
+        return storages[key]
+
+
+def storage_stats():
+    return {path: storage.stats for path, storage in storages.items()}
@@ -0,0 +1,251 @@
+import argparse
+import operator
+import os
+import sqlite3
+import time
+from datetime import datetime
+from functools import lru_cache
+from itertools import compress, repeat
+
+import numpy as np
+import pandas as pd
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "macedonian_stock_exchange.db")
+
+# PRAGMA user_version of a database whose historical_data holds typed columns:
+# REAL prices and turnovers, INTEGER quantities and ISO (YYYY-MM-DD) dates.
+# Version 0/1 databases stored everything as TEXT, prices as "21.600,00".
+SCHEMA_VERSION = 2
+MIGRATION_BATCH_SIZE = 20000
+
+CREATE_HISTORICAL_DATA = '''
+CREATE TABLE IF NOT EXISTS {table} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    issuer_code TEXT NOT NULL,
+    date TEXT,
+    last_price REAL,
+    max_price REAL,
+    min_price REAL,
+    avg_price REAL,
+    percent_change REAL,
+    quantity INTEGER,
+    turnover_best REAL,
+    total_turnover REAL,
+    FOREIGN KEY (issuer_code) REFERENCES issuers (code),
+    UNIQUE(issuer_code, date)
+)
+'''
+
+COLUMNS = ("id", "issuer_code", "date", "last_price", "max_price", "min_price", "avg_price",
+           "percent_change", "quantity", "turnover_best", "total_turnover")
+# Position of quantity in the prices and volumes that follow id, issuer_code and date
+QUANTITY_COLUMN = COLUMNS.index("quantity") - 3
+
+
+def decode_number(value):
+    """Parser output ("21600.00") or legacy display text ("21.600,00") to a float; None when empty."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    text = value.strip()
+    if not text:
+        return None
+    if "," in text:
+        text = text.replace(".", "").replace(",", ".")
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+# decode_numbers parses values with float() this many at a time
+FLOAT_BLOCK = 4096
+
+
+def decode_numbers(values, decimal=",", thousands="."):
+    """decode_number over a whole column: a float64 array, NaN where decode_number gives None.
+
+    A value containing the decimal separator is locale formatted ("21.600,00"):
+    its thousands separators are dropped and the separator becomes a point.
+    Any other value is a plain number like the parser's "21600.00", from which
+    a thousands separator is dropped only when it cannot be a decimal point.
+
+    The locale-formatted values are joined into one buffer and rewritten by a
+    single str.translate, then go through float() in C-level maps of
+    FLOAT_BLOCK values; only a block holding a malformed value falls back to
+    a Python call per value.
+    """
+    if isinstance(values, pd.Series):
+        if pd.api.types.is_numeric_dtype(values.dtype):
+            return values.to_numpy(dtype=np.float64, na_value=np.nan)
+        values = values.to_numpy(dtype=object, na_value=None)
+    else:
+        values = np.fromiter(values, dtype=object, count=len(values))
+    numbers = np.full(len(values), np.nan)
+    is_text = np.fromiter(map(isinstance, values, repeat(str)), dtype=bool, count=len(values))
+    # None becomes NaN; other numbers pass through as decode_number returns them
+    numbers[~is_text] = values[~is_text].astype(np.float64)
+
+    # Empty strings are the usual missing value; leaving them out keeps their blocks on the fast path
+    is_text &= values != ""
+    positions = np.flatnonzero(is_text)
+    texts = values[positions].tolist()
+    localized = np.fromiter(map(operator.contains, texts, repeat(decimal)), dtype=bool, count=len(texts))
+    rewrites = [(localized, str.maketrans({thousands: None, decimal: "."})),
+                (~localized, str.maketrans({thousands: None}) if thousands != "." else None)]
+    for selected, table in rewrites:
+        if selected.any():
+            group = texts if selected.all() else list(compress(texts, selected))
+            if table is not None:
+                group = translate_all(group, table)
+            numbers[positions[selected]] = parse_floats(group)
+    return numbers
+
+
+def translate_all(texts, table):
+    """[text.translate(table) for text in texts], as one translate of the joined texts."""
+    translated = "\x00".join(texts).translate(table).split("\x00")
+    if len(translated) != len(texts):
+        # Some value holds a NUL of its own
+        translated = [text.translate(table) for text in texts]
+    return translated
+
+
+def parse_floats(texts):
+    numbers = np.empty(len(texts))
+    for start in range(0, len(texts), FLOAT_BLOCK):
+        block = texts[start:start + FLOAT_BLOCK]
+        try:
+            numbers[start:start + len(block)] = np.fromiter(map(float, block), dtype=np.float64, count=len(block))
+        except ValueError:
+            numbers[start:start + len(block)] = [float_or_nan(text) for text in block]
+    return numbers
+
+
+def float_or_nan(text):
+    try:
+        return float(text)
+    except ValueError:
+        return np.nan
+
+
+def decode_quantity(value):
+    number = decode_number(value)
+    return None if number is None else int(number)
+
+
+@lru_cache(maxsize=None)
+def parse_session_date(date_str):
+    """mse.mk "m/d/Y" date to (ISO string, ordinal).
+
+    Memoised: a backfill repeats the same few thousand session dates across
+    every issuer, so each distinct string is parsed once per process.
+    """
+    day = datetime.strptime(date_str, "%m/%d/%Y").date()
+    return day.isoformat(), day.toordinal()
+
+
+def newest_first_key(row):
+    """Sort key for (issuer_code, "m/d/Y" date, ...) rows: issuer ascending, newest date first."""
+    return row[0], -parse_session_date(row[1])[1]
+
+
+def iso_date(value):
+    if not value:
+        return None
+    if "/" in value:
+        return parse_session_date(value)[0]
+    return value
+
+
+def typed_rows(rows):
+    """typed_values for many rows of prices and volumes, decoded a column at a time."""
+    if not rows:
+        return []
+    columns = [decode_numbers(column) for column in zip(*rows)]
+    # Quantities are whole numbers, the rest stay floats; missing values become None (NULL)
+    stored = [[None if value != value else (int(value) if i == QUANTITY_COLUMN else value)
+               for value in column.tolist()]
+              for i, column in enumerate(columns)]
+    return list(zip(*stored))
+
+
+def typed_values(prices_and_volumes):
+    """(last, max, min, avg, percent_change, quantity, turnover_best, total_turnover) as stored numbers."""
+    last_price, max_price, min_price, avg_price, percent_change, quantity, turnover_best, total_turnover = \
+        prices_and_volumes
+    return (decode_number(last_price), decode_number(max_price), decode_number(min_price),
+            decode_number(avg_price), decode_number(percent_change), decode_quantity(quantity),
+            decode_number(turnover_best), decode_number(total_turnover))
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def needs_migration(db_path=DB_PATH):
+    conn = sqlite3.connect(db_path)
+    try:
+        has_table = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                                 "AND name = 'historical_data'").fetchone()
+        return bool(has_table) and schema_version(conn) < SCHEMA_VERSION
+    finally:
+        conn.close()
+
+
+def migrate(db_path=DB_PATH, batch_size=MIGRATION_BATCH_SIZE):
+    """Convert a TEXT historical_data table into the typed schema.
+
+    Rows are streamed in id order into historical_data_typed, batch_size at a
+    time, each batch in its own transaction, so memory stays flat and an
+    interrupted migration continues from the last copied id. The tables are
+    swapped in one final transaction.
+    """
+    start_time = time.time()
+    conn = sqlite3.connect(db_path, timeout=60)
+    try:
+        if schema_version(conn) >= SCHEMA_VERSION:
+            print("historical_data already uses typed columns.")
+            return 0
+        conn.execute(CREATE_HISTORICAL_DATA.format(table="historical_data_typed"))
+        conn.commit()
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM historical_data_typed").fetchone()[0]
+
+        copied = 0
+        reader = conn.cursor()
+        reader.execute(f"SELECT {', '.join(COLUMNS)} FROM historical_data WHERE id > ? ORDER BY id", (last_id,))
+        while True:
+            batch = reader.fetchmany(batch_size)
+            if not batch:
+                break
+            with conn:
+                conn.executemany(f"INSERT OR IGNORE INTO historical_data_typed ({', '.join(COLUMNS)}) "
+                                 f"VALUES ({', '.join('?' * len(COLUMNS))})",
+                                 [(record_id, issuer_code, iso_date(date), *values)
+                                  for (record_id, issuer_code, date, *_), values
+                                  in zip(batch, typed_rows([row[3:] for row in batch]))])
+            copied += len(batch)
+            print(f"  copied {copied} rows")
+
+        with conn:
+            conn.execute("BEGIN")
+            conn.execute("DROP TABLE historical_data")
+            conn.execute("ALTER TABLE historical_data_typed RENAME TO historical_data")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_issuer_code_date ON historical_data (issuer_code, date DESC)")
+            conn.execute("DROP TABLE IF EXISTS format_watermark")
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        print(f"Migrated {copied} rows to typed columns in {time.time() - start_time:.2f} seconds.")
+        return copied
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate historical_data to typed numeric columns.")
+    parser.add_argument("--db", default=DB_PATH, help="path of the SQLite database")
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    args = parser.parse_args()
+    migrate(args.db, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+
+from database.storage import get_storage
+
+PENDING = "pending"
+FETCHED = "fetched"
+COMMITTED = "committed"
+
+CREATE_FETCH_CHECKPOINTS = '''
+CREATE TABLE IF NOT EXISTS fetch_checkpoints (
+    issuer_code TEXT NOT NULL,
+    from_date TEXT NOT NULL,
+    to_date TEXT NOT NULL,
+    status TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (issuer_code, from_date, to_date)
+)
+'''
+
+UPSERT_STATUS = '''
+INSERT INTO fetch_checkpoints (issuer_code, from_date, to_date, status, updated_at)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (issuer_code, from_date, to_date) DO UPDATE SET
+    status = excluded.status,
+    updated_at = excluded.updated_at
+WHERE fetch_checkpoints.status != 'committed'
+'''
+
+
+def as_date(value):
+    if isinstance(value, str):
+        return datetime.strptime(value, "%m-%d-%Y").date()
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def merge_ranges(ranges):
+    merged = []
+    for from_date, to_date in sorted(ranges):
+        if merged and from_date <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], to_date))
+        else:
+            merged.append((from_date, to_date))
+    return merged
+
+
+def subtract_ranges(ranges, covered):
+    remaining = []
+    covered = merge_ranges(covered)
+    for from_date, to_date in merge_ranges(ranges):
+        current = from_date
+        for covered_from, covered_to in covered:
+            if covered_to < current or covered_from > to_date:
+                continue
+            if covered_from > current:
+                remaining.append((current, covered_from - timedelta(days=1)))
+            current = max(current, covered_to + timedelta(days=1))
+        if current <= to_date:
+            remaining.append((current, to_date))
+    return remaining
+
+
+class CheckpointJournal:
+    """Per-issuer, per-chunk progress of a backfill, kept in the fetch_checkpoints table.
+
+    The planner records every chunk of a job as pending; the writer thread marks
+    chunks fetched as it takes them off its queue, and committed in the same
+    transaction that inserts their rows. Whatever part of a job is not covered by committed
+    chunks is what a resumed run still has to fetch; comparing date ranges
+    rather than chunk keys keeps this correct when window sizes adapt.
+    """
+
+    def __init__(self, db_path):
+        self.storage = get_storage(db_path)
+        with self.conn:
+            self.conn.execute(CREATE_FETCH_CHECKPOINTS)
+
+    @property
+    def conn(self):
+        # The calling thread's pooled connection; the writer thread passes its own to mark_committed.
+        return self.storage.connection()
+
+    def mark(self, conn, status, chunks):
+        now = datetime.now().isoformat(timespec="seconds")
+        conn.executemany(UPSERT_STATUS, [(issuer_code, as_date(from_date).isoformat(), as_date(to_date).isoformat(),
+                                          status, now)
+                                         for issuer_code, from_date, to_date in chunks])
+
+    def mark_pending(self, issuer_code, date_ranges):
+        with self.conn:
+            self.mark(self.conn, PENDING, [(issuer_code, from_date, to_date) for from_date, to_date in date_ranges])
+
+    def mark_fetched(self, conn, chunks):
+        self.mark(conn, FETCHED, chunks)
+
+    def mark_committed(self, conn, chunks):
+        self.mark(conn, COMMITTED, chunks)
+
+    def load(self):
+        issuers = {}
+        for issuer_code, from_date, to_date, status in self.conn.execute(
+                "SELECT issuer_code, from_date, to_date, status FROM fetch_checkpoints"):
+            date_range = (datetime.strptime(from_date, "%Y-%m-%d").date(),
+                          datetime.strptime(to_date, "%Y-%m-%d").date())
+            planned, committed = issuers.setdefault(issuer_code, ([], []))
+            planned.append(date_range)
+            if status == COMMITTED:
+                committed.append(date_range)
+        return issuers
+
+    def remaining_ranges(self):
+        remaining = {}
+        for issuer_code, (planned, committed) in self.load().items():
+            ranges = subtract_ranges(planned, committed)
+            if ranges:
+                remaining[issuer_code] = ranges
+        return remaining
+
+    def status_counts(self):
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM fetch_checkpoints GROUP BY status").fetchall())
+
+    def committed_days(self):
+        return sum((to_date - from_date).days + 1
+                   for _, committed in self.load().values()
+                   for from_date, to_date in merge_ranges(committed))
+
+    def clear_completed(self):
+        finished = [(issuer_code,) for issuer_code, (planned, committed) in self.load().items()
+                    if not subtract_ranges(planned, committed)]
+        with self.conn:
+            self.conn.executemany("DELETE FROM fetch_checkpoints WHERE issuer_code = ?", finished)
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM fetch_checkpoints")
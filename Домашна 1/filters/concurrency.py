@@ -0,0 +1,87 @@
+import asyncio
+import random
+from collections import deque
+
+INITIAL_LIMIT = 8
+MIN_LIMIT = 1
+MAX_LIMIT = 20
+
+# A completion slower than LATENCY_TOLERANCE times the best smoothed latency
+# seen so far counts as congestion, the same as an error or a throttle reply.
+LATENCY_TOLERANCE = 2.0
+LATENCY_SMOOTHING = 0.1
+LATENCY_WINDOW = 200
+
+# Hedging starts once the latency window has enough samples and never sends
+# more duplicates than HEDGE_BUDGET of all requests.
+HEDGE_MIN_SAMPLES = 20
+HEDGE_BUDGET = 0.05
+
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+MAX_BACKOFF = 30.0
+
+
+def backoff_delay(attempt):
+    # "Full jitter": spread retries uniformly so failed chunks do not retry in lockstep.
+    return random.uniform(0, min(MAX_BACKOFF, BACKOFF_BASE * 2 ** attempt))
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class AdaptiveController:
+    """AIMD limit on in-flight requests to one host.
+
+    Each healthy completion adds 1/limit (about +1 per round trip); an error,
+    throttle reply or latency blow-up halves the limit, at most once per
+    `limit` completions so one burst of failures does not collapse it to 1.
+    """
+
+    def __init__(self, initial_limit=INITIAL_LIMIT, min_limit=MIN_LIMIT, max_limit=MAX_LIMIT):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.in_flight = 0
+        self.slot_freed = asyncio.Condition()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.smoothed_latency = None
+        self.best_latency = None
+        self.since_decrease = 0
+        self.completed = 0
+        self.hedges = 0
+
+    async def acquire(self):
+        async with self.slot_freed:
+            while self.in_flight >= int(self.limit):
+                await self.slot_freed.wait()
+            self.in_flight += 1
+
+    async def release(self, latency, ok):
+        """ok is True for a healthy reply, False for congestion, None for a cancelled hedge loser."""
+        self.in_flight -= 1
+        if ok is not None:
+            self.completed += 1
+            self.since_decrease += 1
+            if ok:
+                self.latencies.append(latency)
+                self.smoothed_latency = latency if self.smoothed_latency is None else (
+                        (1 - LATENCY_SMOOTHING) * self.smoothed_latency + LATENCY_SMOOTHING * latency)
+                self.best_latency = min(self.best_latency or self.smoothed_latency, self.smoothed_latency)
+            congested = not ok or self.smoothed_latency > LATENCY_TOLERANCE * self.best_latency
+            if congested and self.since_decrease >= self.limit:
+                self.limit = max(self.min_limit, self.limit / 2)
+                self.since_decrease = 0
+            elif not congested:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        async with self.slot_freed:
+            self.slot_freed.notify_all()
+
+    def hedge_delay(self):
+        if len(self.latencies) < HEDGE_MIN_SAMPLES or self.hedges >= HEDGE_BUDGET * self.completed:
+            return None
+        return percentile(self.latencies, 0.95)
@@ -0,0 +1,329 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+from .http_cache import history_page_ttl
+from .concurrency import MAX_LIMIT, MAX_RETRIES, AdaptiveController, backoff_delay, percentile
+from .results_table import parse_results_table
+
+BASE_URL = "https://www.mse.mk/en/stats/symbolhistory/{}"
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+# One keep-alive pool is shared by every request of a run, so connections to
+# mse.mk are opened once and reused instead of paying TCP+TLS setup per chunk.
+# How many of them are in flight is decided by the AdaptiveController.
+MAX_CONNECTIONS = 100
+MAX_CONNECTIONS_PER_HOST = MAX_LIMIT
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+KEEPALIVE_TIMEOUT = 60
+REQUEST_TIMEOUT = 60
+
+# Chunk windows adapt per issuer. The newest window is fetched first as a probe,
+# and the rest of the history is split into windows that the probe's rows per
+# day would fill to TARGET_ROWS_PER_PAGE: a page holds at most
+# TRUNCATED_ROWS_PER_PAGE rows, and the margin absorbs livelier years. No
+# window is wider than MAX_DAYS_PER_CHUNK, the widest range mse.mk is known to
+# answer in full; a longer one could come back as a page without a table, which
+# would pass for an empty chunk. A page whose rows stop well short of FromDate
+# is treated as truncated, so the uncovered part is refetched in narrower windows.
+DAYS_PER_CHUNK = 340
+MIN_DAYS_PER_CHUNK = 30
+MAX_DAYS_PER_CHUNK = 365
+TRUNCATED_ROWS_PER_PAGE = 200
+TARGET_ROWS_PER_PAGE = TRUNCATED_ROWS_PER_PAGE * 3 // 4
+TRUNCATION_SLACK_DAYS = 14
+
+# Pages are parsed in worker processes so parsing runs on every core
+# instead of competing for the GIL with the event loop doing network I/O.
+PARSE_WORKERS = os.cpu_count() or 1
+
+
+class FetchStats:
+    def __init__(self):
+        self.requests = 0
+        self.rows = 0
+        self.fetch_time = 0.0
+        self.parse_time = 0.0
+        self.skipped_chunks = 0
+        self.cache_hits = 0
+        self.retries = 0
+        self.hedged = 0
+        self.failed_chunks = 0
+        self.latencies = []
+        self.elapsed = 0.0
+        self.final_limit = None
+
+    def request_rate(self):
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    def latency_percentile(self, q):
+        return percentile(self.latencies, q) or 0.0
+
+
+def get_date_ranges(start_date, end_date, days_per_chunk=DAYS_PER_CHUNK):
+    if isinstance(start_date, str):
+        start_date = datetime.strptime(start_date, "%m-%d-%Y")
+    if isinstance(end_date, str):
+        end_date = datetime.strptime(end_date, "%m-%d-%Y")
+    date_ranges = []
+    current_start = start_date
+    while current_start <= end_date:
+        current_end = min(current_start + timedelta(days=days_per_chunk - 1), end_date)
+        date_ranges.append((current_start.strftime("%m-%d-%Y"), current_end.strftime("%m-%d-%Y")))
+        current_start = current_end + timedelta(days=1)
+    return date_ranges
+
+
+def parse_data_from_html(html_content, issuer_code):
+    soup = BeautifulSoup(html_content, "html.parser")
+    table = soup.find("table", id="resultsTable")
+    data = []
+    if table:
+        rows = table.find_all("tr")
+        for row in rows[1:]:
+            columns = row.find_all("td")
+            if len(columns) == 9:
+                data.append((issuer_code,
+                             columns[0].text.strip(),
+                             columns[1].text.strip().replace(",", ""),
+                             columns[2].text.strip().replace(",", ""),
+                             columns[3].text.strip().replace(",", ""),
+                             columns[4].text.strip().replace(",", ""),
+                             columns[5].text.strip(),
+                             columns[6].text.strip().replace(",", ""),
+                             columns[7].text.strip().replace(",", ""),
+                             columns[8].text.strip().replace(",", "")))
+    return data
+
+
+def parse_page(page, encoding, issuer_code):
+    start_time = time.perf_counter()
+    rows = parse_results_table(page.decode(encoding, errors="replace"), issuer_code)
+    return rows, time.perf_counter() - start_time
+
+
+def create_session():
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS,
+                                     limit_per_host=MAX_CONNECTIONS_PER_HOST,
+                                     keepalive_timeout=KEEPALIVE_TIMEOUT,
+                                     ttl_dns_cache=300)
+    return aiohttp.ClientSession(connector=connector,
+                                 headers=HEADERS,
+                                 timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT))
+
+
+def range_bounds(date_range):
+    return tuple(datetime.strptime(date, "%m-%d-%Y") for date in date_range)
+
+
+def oldest_row_date(rows):
+    dates = []
+    for row in rows:
+        try:
+            dates.append(datetime.strptime(row[1], "%m/%d/%Y"))
+        except ValueError:
+            continue
+    return min(dates, default=None)
+
+
+def clamp_days_per_chunk(days):
+    return min(MAX_DAYS_PER_CHUNK, max(MIN_DAYS_PER_CHUNK, days))
+
+
+def plan_days_per_chunk(probe_chunks):
+    if len(probe_chunks) > 1:
+        return clamp_days_per_chunk(min((to_date - from_date).days + 1 for (from_date, to_date), _ in probe_chunks))
+    if not probe_chunks:
+        return DAYS_PER_CHUNK
+    (from_date, to_date), rows = probe_chunks[0]
+    # An empty probe still bounds the density below one row per probe window
+    density = max(len(rows), 1) / ((to_date - from_date).days + 1)
+    return clamp_days_per_chunk(int(TARGET_ROWS_PER_PAGE / density))
+
+
+class FetchEngine:
+    def __init__(self, session, parse_pool, stats, on_chunk_done=None, cache=None):
+        self.session = session
+        self.parse_pool = parse_pool
+        self.stats = stats
+        self.on_chunk_done = on_chunk_done
+        self.cache = cache
+        self.controller = AdaptiveController()
+
+    async def timed_get(self, url, params):
+        await self.controller.acquire()
+        start_time = time.perf_counter()
+        healthy = False
+        try:
+            async with self.session.get(url, params=params) as response:
+                page = await response.read() if response.status == 200 else None
+                healthy = response.status not in RETRY_STATUSES
+                return response.status, page, response.get_encoding() if page is not None else None
+        except asyncio.CancelledError:
+            healthy = None
+            raise
+        finally:
+            latency = time.perf_counter() - start_time
+            await self.controller.release(latency, healthy)
+            self.stats.requests += 1
+            self.stats.fetch_time += latency
+            if healthy is not None:
+                self.stats.latencies.append(latency)
+
+    async def hedged_get(self, url, params):
+        primary = asyncio.create_task(self.timed_get(url, params))
+        hedge_delay = self.controller.hedge_delay()
+        if hedge_delay is None:
+            return await primary
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+        if done:
+            return primary.result()
+
+        # The call is already slower than p95: race a duplicate and keep whichever answers first.
+        self.controller.hedges += 1
+        self.stats.hedged += 1
+        pending = {primary, asyncio.create_task(self.timed_get(url, params))}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def fetch_chunk(self, issuer_code, start_date_range, end_date_range):
+        """Returns the parsed rows, or None when the chunk could not be fetched."""
+        url = BASE_URL.format(issuer_code)
+        params = {"FromDate": start_date_range.replace("-", "/"),
+                  "ToDate": end_date_range.replace("-", "/")}
+        cached = self.cache.get(url, params) if self.cache else None
+        if cached:
+            self.stats.cache_hits += 1
+            return await self.parse(issuer_code, *cached)
+
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                status, page, encoding = await self.hedged_get(url, params)
+                error = f"HTTP {status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status, error = None, str(e) or type(e).__name__
+            if status == 200:
+                break
+            if status is not None and status not in RETRY_STATUSES:
+                print(f"Error fetching data for {issuer_code} ({start_date_range} - {end_date_range}): {error}")
+                self.stats.failed_chunks += 1
+                return None
+            if attempt < MAX_RETRIES:
+                self.stats.retries += 1
+                await asyncio.sleep(backoff_delay(attempt))
+        else:
+            print(f"Giving up on {issuer_code} ({start_date_range} - {end_date_range}) "
+                  f"after {MAX_RETRIES} retries: {error}")
+            self.stats.failed_chunks += 1
+            return None
+
+        if self.cache:
+            self.cache.put(url, params, page, encoding, ttl=history_page_ttl(end_date_range))
+        return await self.parse(issuer_code, page, encoding)
+
+    async def parse(self, issuer_code, page, encoding):
+        loop = asyncio.get_running_loop()
+        rows, parse_time = await loop.run_in_executor(self.parse_pool, parse_page, page, encoding, issuer_code)
+        self.stats.rows += len(rows)
+        self.stats.parse_time += parse_time
+        return rows
+
+    async def fetch_ranges(self, issuer_code, date_ranges):
+        chunks = []
+        for sub_chunks in await asyncio.gather(*(self.fetch_range(issuer_code, *range_bounds(date_range))
+                                                 for date_range in date_ranges)):
+            chunks.extend(sub_chunks)
+        return chunks
+
+    async def chunk_done(self, issuer_code, from_date, to_date, rows):
+        if self.on_chunk_done:
+            await run_callback(self.on_chunk_done, issuer_code, (from_date, to_date), rows)
+        return [((from_date, to_date), rows)]
+
+    async def fetch_range(self, issuer_code, from_date, to_date):
+        rows = await self.fetch_chunk(issuer_code, from_date.strftime("%m-%d-%Y"), to_date.strftime("%m-%d-%Y"))
+        if rows is None:
+            # Not reported as done, so the journal keeps the chunk for a resumed run.
+            return []
+        if len(rows) < TRUNCATED_ROWS_PER_PAGE:
+            return await self.chunk_done(issuer_code, from_date, to_date, rows)
+        oldest_date = oldest_row_date(rows)
+        if oldest_date is None or (oldest_date - from_date).days <= TRUNCATION_SLACK_DAYS:
+            return await self.chunk_done(issuer_code, from_date, to_date, rows)
+
+        # The page stopped early: keep what it covered and refetch the rest in
+        # windows no wider than the span this page managed to return.
+        days_per_chunk = clamp_days_per_chunk((to_date - oldest_date).days + 1)
+        remainder = get_date_ranges(from_date, oldest_date - timedelta(days=1), days_per_chunk)
+        chunks = await self.chunk_done(issuer_code, oldest_date, to_date, rows)
+        return chunks + await self.fetch_ranges(issuer_code, remainder)
+
+    async def fetch_issuer(self, issuer_code, start_date, end_date):
+        date_ranges = get_date_ranges(start_date, end_date)
+        if not date_ranges:
+            return issuer_code, []
+        first_date = range_bounds(date_ranges[0])[0]
+        last_date = range_bounds(date_ranges[-1])[1]
+        probe_from = max(first_date, last_date - timedelta(days=DAYS_PER_CHUNK - 1))
+
+        chunks = await self.fetch_range(issuer_code, probe_from, last_date)
+        if first_date < probe_from:
+            remaining = get_date_ranges(first_date, probe_from - timedelta(days=1), plan_days_per_chunk(chunks))
+            chunks.extend(await self.fetch_ranges(issuer_code, remaining))
+
+        # Chunks finish in any order; merge them back oldest window first.
+        chunks.sort(key=lambda chunk: chunk[0])
+        return issuer_code, [row for _, rows in chunks for row in rows]
+
+
+async def run_callback(callback, *args):
+    # Callbacks hand rows to the DatabaseWriter, whose submit() blocks while its
+    # queue is full; on a thread that wait holds back only the task reporting
+    # the rows, while the event loop keeps every other request going.
+    await asyncio.get_running_loop().run_in_executor(None, callback, *args)
+
+
+async def fetch_all_async(jobs, on_issuer_done=None, stats=None, on_chunk_done=None, cache=None):
+    stats = stats if stats is not None else FetchStats()
+    results = {}
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=PARSE_WORKERS) as parse_pool:
+        async with create_session() as session:
+            engine = FetchEngine(session, parse_pool, stats, on_chunk_done, cache)
+            tasks = [asyncio.create_task(engine.fetch_issuer(*job)) for job in jobs]
+            for task in asyncio.as_completed(tasks):
+                issuer_code, issuer_data = await task
+                if on_issuer_done:
+                    await run_callback(on_issuer_done, issuer_code, issuer_data)
+                elif not on_chunk_done:
+                    results.setdefault(issuer_code, []).extend(issuer_data)
+            stats.final_limit = engine.controller.limit
+    stats.elapsed = time.perf_counter() - start_time
+    return results
+
+
+def fetch_all(jobs, on_issuer_done=None, stats=None, on_chunk_done=None, cache=None):
+    """Fetch every (issuer_code, start_date, end_date) job over one pooled session.
+
+    Returns {issuer_code: rows}, or streams each issuer to on_issuer_done, or
+    each fetched window to on_chunk_done(issuer_code, (from_date, to_date), rows)
+    instead; given both, it calls both. Request and parse times are accumulated
+    into stats (a FetchStats). With a PageCache, pages it holds are parsed from
+    disk instead of downloaded.
+    """
+    return asyncio.run(fetch_all_async(jobs, on_issuer_done, stats, on_chunk_done, cache))
@@ -1,20 +1,37 @@
 import os
 import requests
 from bs4 import BeautifulSoup
-import sqlite3
+from .http_cache import INDEX_PAGE_TTL, PageCache
+from database.storage import get_storage
 
 # Define the database path relative to the script’s location
 DB_PATH = os.path.join(os.path.dirname(__file__), "../database/macedonian_stock_exchange.db")
 
-def fetch_issuers():
+def fetch_index_page(url, use_cache=True):
+    cache = PageCache() if use_cache else None
+    try:
+        cached = cache.get(url) if cache else None
+        if cached:
+            body, encoding = cached
+            return body.decode(encoding or "utf-8", errors="replace")
+
+        response = requests.get(url)
+        response.raise_for_status()
+        if cache:
+            cache.put(url, None, response.text.encode("utf-8"), "utf-8", ttl=INDEX_PAGE_TTL)
+        return response.text
+    finally:
+        if cache:
+            cache.close()
+
+def fetch_issuers(use_cache=True):
     url = "https://www.mse.mk/en/stats/symbolhistory/kmb"
 
     # Fetch page content
-    response = requests.get(url)
-    response.raise_for_status()
+    page = fetch_index_page(url, use_cache)
 
     # Parse page content with BeautifulSoup
-    soup = BeautifulSoup(response.text, "html.parser")
+    soup = BeautifulSoup(page, "html.parser")
 
     # Extract issuer codes and names
     issuers = []
@@ -28,14 +45,9 @@ def fetch_issuers():
             issuers.append((code, name))
 
     # Store issuers in the database
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    for code, name in issuers:
-        cursor.execute("INSERT OR IGNORE INTO issuers (code, name) VALUES (?, ?)", (code, name))
-
-    conn.commit()
-    conn.close()
+    storage = get_storage(DB_PATH)
+    with storage.transaction():
+        storage.executemany("INSERT OR IGNORE INTO issuers (code, name) VALUES (?, ?)", issuers)
     print("Issuers fetched and stored in database.")
 
 if __name__ == "__main__":
@@ -1,150 +1,161 @@
 import os
-import sqlite3
+from collections import defaultdict
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from .checkpoint import as_date, subtract_ranges
 from .filter2 import *
+from .trading_calendar import load_calendar, record_closures
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "../database/macedonian_stock_exchange.db")
 
+# The last session each issuer's history was fetched up to. Most issuers do not
+# trade every session, so their last row says little about what was checked:
+# without this every run would refetch the tail of each illiquid issuer (and
+# the whole history of one with no rows) only to find nothing new.
+CREATE_ISSUER_CHECKS = '''
+CREATE TABLE IF NOT EXISTS issuer_checks (
+    issuer_code TEXT PRIMARY KEY,
+    checked_through TEXT NOT NULL
+)
+'''
 
-def fetch_missing_data(issuer_code, last_available_date, end_date):
+
+def get_missing_range(issuer_code, last_available_date, end_date):
     start_date = last_available_date + timedelta(days=1) if last_available_date else end_date - timedelta(days=3650)
    # print(
     #    f"Fetching data for issuer {issuer_code} from {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
+    return issuer_code, start_date, end_date
 
-    # Fetch and parse the data from the server
-    missing_data = fetch_and_parse_issuer_data(issuer_code, start_date, end_date)
 
-    #if missing_data:
-     #   print(f"Fetched {len(missing_data)} records for {issuer_code}")
-    #else:
-     #   print(f"No new data fetched for {issuer_code}")
+def fetch_issuer_date_spans():
+    rows = get_storage(DB_PATH).query("""
+        SELECT issuer_code, MIN(date), MAX(date) FROM historical_data
+        GROUP BY issuer_code
+    """)
+    return {issuer_code: (datetime.strptime(first_date, "%Y-%m-%d"), datetime.strptime(last_date, "%Y-%m-%d"))
+            for issuer_code, first_date, last_date in rows if first_date}
 
-    return missing_data
 
+def fetch_checked_through():
+    storage = get_storage(DB_PATH)
+    with storage.transaction():
+        storage.execute(CREATE_ISSUER_CHECKS)
+    return {issuer_code: datetime.strptime(checked_through, "%Y-%m-%d")
+            for issuer_code, checked_through in storage.query("SELECT issuer_code, checked_through FROM issuer_checks")}
 
-def update_issuer_data():
-    end_date = datetime.today()
-    print(f"Current date: {end_date.strftime('%Y-%m-%d')}")
 
-    issuer_codes = fetch_issuer_codes()
-    print(f"Found {len(issuer_codes)} issuers to check.")
+def record_checked_through(issuer_codes, end_date):
+    storage = get_storage(DB_PATH)
+    with storage.transaction():
+        storage.execute(CREATE_ISSUER_CHECKS)
+        storage.executemany("INSERT INTO issuer_checks (issuer_code, checked_through) VALUES (?, ?) "
+                            "ON CONFLICT (issuer_code) DO UPDATE SET checked_through = excluded.checked_through",
+                            [(issuer_code, end_date.strftime("%Y-%m-%d")) for issuer_code in issuer_codes])
 
 
-    all_missing_data = []
+def fetch_trading_dates():
+    rows = get_storage(DB_PATH).query("SELECT DISTINCT date FROM historical_data")
+    return {datetime.strptime(row[0], "%Y-%m-%d").date() for row in rows if row[0]}
 
-    with ThreadPoolExecutor(max_workers=100) as executor:
-        future_to_issuer = {
-            executor.submit(fetch_issuer_data, issuer_code, end_date): issuer_code
-            for issuer_code in issuer_codes
-        }
 
-        for future in as_completed(future_to_issuer):
-            issuer_code = future_to_issuer[future]
-            try:
-                missing_data = future.result()
-                if missing_data:
-                    all_missing_data.extend(missing_data)
-            except Exception as exc:
-                print(f"Error fetching data for {issuer_code}: {exc}")
+def update_issuer_data(use_cache=True):
+    now = datetime.today()
+    calendar = load_calendar(DB_PATH)
+    last_session = calendar.last_session(now)
+    end_date = datetime.combine(last_session, datetime.min.time())
+    print(f"Current date: {now.strftime('%Y-%m-%d')}, last trading session: {last_session.isoformat()}")
 
-    if all_missing_data:
-        all_missing_data = sort_and_format_data(all_missing_data)
-        print(f"Sorted and formatted {len(all_missing_data)} records.")
+    issuer_codes = fetch_issuer_codes()
+    print(f"Found {len(issuer_codes)} issuers to check.")
 
-        # Insert the new data into the database in bulk
-        insert_data_into_db_bulk(all_missing_data)
-        print(f"Inserted {len(all_missing_data)} new records.")
+    date_spans = fetch_issuer_date_spans()
+    checked_through = fetch_checked_through()
+    gaps = calendar.missing_sessions(fetch_trading_dates())
+    if gaps:
+        print(f"Found {len(gaps)} gaps with no data for any issuer, refetching them.")
+
+    jobs = []
+    for issuer_code in issuer_codes:
+        jobs.extend(plan_issuer_fetch(issuer_code, date_spans.get(issuer_code), end_date, gaps,
+                                      checked_through.get(issuer_code)))
+    current_issuers = len(issuer_codes) - len({job[0] for job in jobs})
+    print(f"{current_issuers} issuers are already current, scheduled {len(jobs)} ranges for the rest.")
+
+    stats = FetchStats()
+    writer = DatabaseWriter(DB_PATH, prepare=sort_and_format_data)
+    writer.start()
+    # Windows each issuer actually got back; a failed chunk is never reported here
+    fetched = defaultdict(list)
+
+    def on_chunk_done(issuer_code, date_range, rows):
+        fetched[issuer_code].append(tuple(as_date(day) for day in date_range))
+
+    cache = PageCache() if use_cache else None
+    try:
+        fetch_all(jobs, on_issuer_done=writer.submit, stats=stats, on_chunk_done=on_chunk_done, cache=cache)
+    finally:
+        try:
+            writer.close()
+        finally:
+            if cache:
+                cache.close()
+
+    if writer.rows_written:
+        print(f"Inserted {writer.rows_written} new records for {writer.issuers_written} issuers.")
     else:
         print("No new data to insert.")
-
-    sort_database()
-
-
-def fetch_issuer_data(issuer_code, end_date):
-    last_available_date = fetch_last_available_date(issuer_code)
-    if last_available_date:
-       # print(f"Last available date for {issuer_code}: {last_available_date.strftime('%Y-%m-%d')}")
-        if last_available_date < end_date:
-            return fetch_missing_data(issuer_code, last_available_date, end_date)
-    else:
+    record_checked_through(checked_issuers(jobs, end_date, fetched), end_date)
+
+    if gaps:
+        # Sessions that are still empty after a refetch were market closures, but only
+        # where every fetch of the gap succeeded: a failed one says nothing about the day.
+        trading_dates = fetch_trading_dates()
+        refetched = fetched_gaps(gaps, jobs, fetched)
+        if len(refetched) < len(gaps):
+            print(f"{len(gaps) - len(refetched)} gaps were not fetched completely; they are checked again next run.")
+        record_closures(DB_PATH, [day for gap_from, gap_to in refetched
+                                  for day in calendar.sessions(gap_from, gap_to) if day not in trading_dates])
+
+    return stats
+
+
+def fetched_gaps(gaps, jobs, fetched):
+    """The gaps whose every scheduled issuer fetch covered them; fetched maps issuer_code -> date ranges."""
+    complete = []
+    for gap_from, gap_to in gaps:
+        issuers = [issuer_code for issuer_code, from_date, to_date in jobs
+                   if (from_date.date(), to_date.date()) == (gap_from, gap_to)]
+        if all(not subtract_ranges([(gap_from, gap_to)], fetched[issuer_code]) for issuer_code in issuers):
+            complete.append((gap_from, gap_to))
+    return complete
+
+
+def checked_issuers(jobs, end_date, fetched):
+    """The issuers whose fetch up to end_date came back whole, empty pages included."""
+    return [issuer_code for issuer_code, from_date, to_date in jobs
+            if to_date == end_date and not subtract_ranges([(from_date.date(), to_date.date())], fetched[issuer_code])]
+
+
+def plan_issuer_fetch(issuer_code, date_span, end_date, gaps=(), checked_through=None):
+    if not date_span:
+        if checked_through is not None and checked_through >= end_date:
+            return []
         #print(f"No data found for issuer {issuer_code}, fetching from 10 years ago.")
-        return fetch_missing_data(issuer_code, None, end_date)
-
-
-def format_price(price):
-    if price is None:
-        return None  # Return None if price is None
-
-    # print(f"Original price: {price} (Type: {type(price)})")
-
-    try:
-        price = float(price)  # Ensure price is treated as a float
-        return f"{price:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except ValueError:
-        # Handle the case where the price can't be converted to a float
-        print(f"Failed to convert price: {price} to float")
-        return None  # Return None if conversion fails
-
-
-def clean_price(price):
-    if price is None:
-        return None
-    try:
-        cleaned_price = ''.join(c for c in str(price) if c.isdigit() or c == '.')
-        return float(cleaned_price) if cleaned_price else None
-    except ValueError:
-        return None
-
-
-def sort_database():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    try:
-        cursor.execute("PRAGMA foreign_keys = ON;")
-
-        cursor.execute(""" 
-            CREATE INDEX IF NOT EXISTS idx_issuer_code_date ON historical_data (issuer_code, date DESC);
-        """)
-
-        # Fetch all the data and format the prices
-        cursor.execute("SELECT * FROM historical_data")
-        all_data = cursor.fetchall()
-
-        formatted_data = []
-        for record in all_data:
-            formatted_record = {
-                "id": record[0],
-                "issuer_code": record[1],
-                "date": record[2],
-                "last_price": format_price(clean_price(record[3])),
-                "max_price": format_price(clean_price(record[4])),
-                "min_price": format_price(clean_price(record[5])),
-                "avg_price": format_price(clean_price(record[6])),
-                "percent_change": record[7],
-                "quantity": record[8],
-                "turnover_best": record[9],
-                "total_turnover": record[10]
-            }
-            formatted_data.append(formatted_record)
-
-        cursor.execute("DELETE FROM historical_data")
-        cursor.executemany("""
-            INSERT INTO historical_data (id, issuer_code, date, last_price, max_price, min_price, avg_price, percent_change, quantity, turnover_best, total_turnover)
-            VALUES (:id, :issuer_code, :date, :last_price, :max_price, :min_price, :avg_price, :percent_change, :quantity, :turnover_best, :total_turnover)
-        """, formatted_data)
-
-        conn.commit()
-
-    except sqlite3.Error as e:
-        print(f"Error while sorting and formatting database: {e}")
-    finally:
-        conn.close()
-
-
-def main():
-    update_issuer_data()
+        return [get_missing_range(issuer_code, checked_through, end_date)]
+
+    first_date, last_available_date = date_span
+    jobs = [(issuer_code, datetime.combine(gap_from, datetime.min.time()), datetime.combine(gap_to, datetime.min.time()))
+            for gap_from, gap_to in gaps
+            if first_date.date() < gap_from and gap_to < last_available_date.date()]
+   # print(f"Last available date for {issuer_code}: {last_available_date.strftime('%Y-%m-%d')}")
+    # Sessions after the last row were looked at already up to checked_through
+    tail_from = max(last_available_date, checked_through) if checked_through else last_available_date
+    if tail_from < end_date:
+        jobs.append(get_missing_range(issuer_code, tail_from, end_date))
+    return jobs
+
+
+def main(use_cache=True):
+    return update_issuer_data(use_cache)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,172 @@
+import hashlib
+import os
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+from urllib.parse import urlencode
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), "../database/http_cache")
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+
+# A history page whose ToDate is this many days in the past is final: mse.mk
+# does not revise closed sessions, so it is cached forever. Newer pages (the
+# current-period chunk) and index/listing pages are only kept briefly.
+IMMUTABLE_AFTER_DAYS = 7
+RECENT_PAGE_TTL = 15 * 60
+INDEX_PAGE_TTL = 60 * 60
+
+CREATE_PAGES = '''
+CREATE TABLE IF NOT EXISTS pages (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    encoding TEXT,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL,
+    last_used REAL NOT NULL
+)
+'''
+CREATE_CONTENT_INDEX = "CREATE INDEX IF NOT EXISTS pages_content_hash ON pages (content_hash)"
+
+
+def cache_key(url, params=None):
+    query = urlencode(sorted(params.items())) if params else ""
+    return hashlib.sha256(f"{url}?{query}".encode("utf-8")).hexdigest()
+
+
+def history_page_ttl(to_date, today=None):
+    """None (never expires) for a closed historical range, RECENT_PAGE_TTL otherwise."""
+    if isinstance(to_date, str):
+        to_date = datetime.strptime(to_date, "%m-%d-%Y").date()
+    elif isinstance(to_date, datetime):
+        to_date = to_date.date()
+    today = today or date.today()
+    return None if to_date < today - timedelta(days=IMMUTABLE_AFTER_DAYS) else RECENT_PAGE_TTL
+
+
+class PageCache:
+    """Content-addressed on-disk cache of HTTP response bodies.
+
+    Bodies are stored once per SHA-256 of their content (the many identical
+    empty pages of illiquid issuers share one file) and an SQLite index maps
+    sha256(url + sorted params) to a body with an optional expiry. When the
+    stored bodies exceed max_bytes, expired and then least recently used
+    entries are evicted. Their size is kept as a running total, so a put
+    does not sum the index; evict recounts it, which also picks up what
+    other processes sharing the directory stored meanwhile.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(cache_dir, "index.db"), timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(CREATE_PAGES)
+        self.conn.execute(CREATE_CONTENT_INDEX)
+        self.total = self.total_bytes()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def object_path(self, content_hash):
+        return os.path.join(self.cache_dir, "objects", content_hash[:2], content_hash)
+
+    def get(self, url, params=None):
+        """Returns (body, encoding) for a fresh entry, or None."""
+        key = cache_key(url, params)
+        row = self.conn.execute("SELECT content_hash, encoding, expires_at, size FROM pages WHERE key = ?",
+                                (key,)).fetchone()
+        now = time.time()
+        if row is None or (row[2] is not None and row[2] <= now):
+            self.misses += 1
+            return None
+        content_hash, encoding, _, size = row
+        try:
+            with open(self.object_path(content_hash), "rb") as f:
+                body = f.read()
+        except FileNotFoundError:
+            self.conn.execute("DELETE FROM pages WHERE key = ?", (key,))
+            self.release(content_hash, size)
+            self.misses += 1
+            return None
+        self.conn.execute("UPDATE pages SET last_used = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return body, encoding
+
+    def put(self, url, params, body, encoding=None, ttl=None):
+        """Store body for url+params; ttl is in seconds, None keeps it until evicted."""
+        content_hash = hashlib.sha256(body).hexdigest()
+        path = self.object_path(content_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(body)
+            os.replace(temp_path, path)
+        key = cache_key(url, params)
+        replaced = self.conn.execute("SELECT content_hash, size FROM pages WHERE key = ?", (key,)).fetchone()
+        stored = self.referenced(content_hash)
+        now = time.time()
+        self.conn.execute("INSERT OR REPLACE INTO pages "
+                          "(key, url, content_hash, encoding, size, stored_at, expires_at, last_used) "
+                          "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                          (key, url, content_hash, encoding, len(body), now,
+                           None if ttl is None else now + ttl, now))
+        if not stored:
+            self.total += len(body)
+        if replaced is not None and replaced[0] != content_hash:
+            self.release(*replaced)
+        if self.total > self.max_bytes:
+            self.evict()
+
+    def referenced(self, content_hash):
+        return self.conn.execute("SELECT 1 FROM pages WHERE content_hash = ? LIMIT 1",
+                                 (content_hash,)).fetchone() is not None
+
+    def release(self, content_hash, size):
+        # A body counts towards the total while any entry still points at it
+        if not self.referenced(content_hash):
+            self.total -= size
+
+    def total_bytes(self):
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM "
+                                 "(SELECT size FROM pages GROUP BY content_hash)").fetchone()[0]
+
+    def evict(self, target=None):
+        target = self.max_bytes * 0.9 if target is None else target
+        self.conn.execute("DELETE FROM pages WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        total = self.total_bytes()
+        if total > target:
+            evicted = []
+            for key, size in self.conn.execute("SELECT key, size FROM pages ORDER BY last_used"):
+                if total <= target:
+                    break
+                evicted.append((key,))
+                total -= size
+            self.conn.executemany("DELETE FROM pages WHERE key = ?", evicted)
+        self.total = self.total_bytes()
+        self.remove_orphans()
+
+    def remove_orphans(self):
+        referenced = {row[0] for row in self.conn.execute("SELECT DISTINCT content_hash FROM pages")}
+        objects_dir = os.path.join(self.cache_dir, "objects")
+        for prefix in os.listdir(objects_dir):
+            for name in os.listdir(os.path.join(objects_dir, prefix)):
+                if name not in referenced and not name.endswith(".tmp"):
+                    os.remove(os.path.join(objects_dir, prefix, name))
+
+    def clear(self):
+        self.conn.execute("DELETE FROM pages")
+        self.total = 0
+        self.remove_orphans()
@@ -0,0 +1,87 @@
+import re
+from html import unescape
+
+TABLE_START = re.compile(r"<table[^>]*\bid\s*=\s*[\"']?resultsTable\b", re.IGNORECASE)
+TOKEN = re.compile(r"<!--.*?-->|<[!?][^>]*>|<(/?)([a-zA-Z][^\s/>]*)([^>]*)>", re.DOTALL)
+ID_ATTRIBUTE = re.compile(r"""\bid\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""", re.IGNORECASE)
+STRIP_COMMAS = (False, True, True, True, True, False, True, True, True)
+
+
+def is_results_table(attributes):
+    match = ID_ATTRIBUTE.search(attributes)
+    return match is not None and unescape(next(value for value in match.groups() if value is not None)) == "resultsTable"
+
+
+def tokenize_rows(html_content):
+    """Streams the tags of #resultsTable and collects the text of every td per tr.
+
+    Open table/tr/td tags are kept on a stack and closed the way BeautifulSoup's
+    html.parser builder closes them, so cell text matches `td.text` even for
+    unclosed or nested cells.
+    """
+    stack = []
+    open_cells = []
+    rows = []
+    position = 0
+    for token in TOKEN.finditer(html_content):
+        if open_cells and token.start() > position:
+            data = html_content[position:token.start()]
+            if "&" in data:
+                data = unescape(data)
+            for cell in open_cells:
+                cell.append(data)
+        position = token.end()
+
+        closing, tag, attributes = token.groups()
+        if tag is None:
+            continue
+        tag = tag.lower()
+        if not stack:
+            if tag == "table" and not closing and is_results_table(attributes):
+                stack.append(("table", None))
+            continue
+
+        if not closing:
+            if tag == "tr":
+                row = []
+                rows.append(row)
+                stack.append(("tr", row))
+            elif tag == "td":
+                cell = []
+                for name, row in stack:
+                    if name == "tr":
+                        row.append(cell)
+                open_cells.append(cell)
+                stack.append(("td", cell))
+            elif tag == "table":
+                stack.append(("table", None))
+        elif tag in ("table", "tr", "td") and any(name == tag for name, _ in stack):
+            while True:
+                name, _ = stack.pop()
+                if name == "td":
+                    open_cells.pop()
+                if name == tag:
+                    break
+            if not stack:
+                return rows
+
+    if open_cells and position < len(html_content):
+        data = unescape(html_content[position:])
+        for cell in open_cells:
+            cell.append(data)
+    return rows
+
+
+def parse_results_table(html_content, issuer_code):
+    """Drop-in replacement for parse_data_from_html that skips building a soup."""
+    match = TABLE_START.search(html_content)
+    if match is None:
+        return []
+
+    data = []
+    for row in tokenize_rows(html_content[match.start():])[1:]:
+        if len(row) == 9:
+            values = ["".join(cell).strip() for cell in row]
+            data.append((issuer_code, *(value.replace(",", "") if strip else value
+                                        for value, strip in zip(values, STRIP_COMMAS))))
+    return data
@@ -0,0 +1,117 @@
+from datetime import date, datetime, time, timedelta
+
+from database.storage import get_storage
+
+# Results of a session are published on mse.mk shortly after the 13:00 close.
+SESSION_PUBLISHED = time(14, 0)
+
+# Non-working days in North Macedonia that close the exchange. A holiday that
+# falls on a Sunday moves to the following Monday.
+FIXED_HOLIDAYS = [(1, 1), (1, 2), (1, 7), (5, 1), (5, 24), (8, 2), (9, 8), (10, 11), (10, 23), (12, 8)]
+
+# Ramazan Bajram follows the lunar calendar, so its first day is listed per year.
+EID_AL_FITR = {
+    2014: date(2014, 7, 28), 2015: date(2015, 7, 17), 2016: date(2016, 7, 5), 2017: date(2017, 6, 25),
+    2018: date(2018, 6, 15), 2019: date(2019, 6, 4), 2020: date(2020, 5, 24), 2021: date(2021, 5, 13),
+    2022: date(2022, 5, 2), 2023: date(2023, 4, 21), 2024: date(2024, 4, 10), 2025: date(2025, 3, 30),
+    2026: date(2026, 3, 20), 2027: date(2027, 3, 9), 2028: date(2028, 2, 26), 2029: date(2029, 2, 14),
+    2030: date(2030, 2, 4),
+}
+
+CREATE_NON_TRADING_DAYS = '''
+CREATE TABLE IF NOT EXISTS non_trading_days (
+    date TEXT PRIMARY KEY
+)
+'''
+
+
+def orthodox_easter(year):
+    a, b, c = year % 4, year % 7, year % 19
+    d = (19 * c + 15) % 30
+    e = (2 * a + 4 * b - d + 34) % 7
+    month, day = divmod(d + e + 114, 31)
+    # Julian calendar date shifted to the Gregorian calendar (valid 1900-2099).
+    return date(year, month, day + 1) + timedelta(days=13)
+
+
+def holidays(year):
+    days = set()
+    observed = [date(year, month, day) for month, day in FIXED_HOLIDAYS]
+    if year in EID_AL_FITR:
+        observed.append(EID_AL_FITR[year])
+    for holiday in observed:
+        days.add(holiday)
+        if holiday.weekday() == 6:
+            days.add(holiday + timedelta(days=1))
+    days.add(orthodox_easter(year) + timedelta(days=1))
+    return days
+
+
+class TradingCalendar:
+    """Trading sessions of the Macedonian Stock Exchange.
+
+    Weekends and public holidays are known up front; closures the holiday table
+    misses are learned from the database (see record_closures), so an unlisted
+    holiday costs one refetch instead of one per run.
+    """
+
+    def __init__(self, closures=()):
+        self.closures = set(closures)
+        self.holidays_by_year = {}
+
+    def is_trading_day(self, day):
+        if day.weekday() >= 5 or day in self.closures:
+            return False
+        if day.year not in self.holidays_by_year:
+            self.holidays_by_year[day.year] = holidays(day.year)
+        return day not in self.holidays_by_year[day.year]
+
+    def previous_session(self, day):
+        day -= timedelta(days=1)
+        while not self.is_trading_day(day):
+            day -= timedelta(days=1)
+        return day
+
+    def last_session(self, now):
+        today = now.date()
+        if self.is_trading_day(today) and now.time() >= SESSION_PUBLISHED:
+            return today
+        return self.previous_session(today)
+
+    def sessions(self, start, end):
+        day = start
+        while day <= end:
+            if self.is_trading_day(day):
+                yield day
+            day += timedelta(days=1)
+
+    def missing_sessions(self, present_dates):
+        """Group sessions with no rows at all between the first and last stored date into ranges."""
+        if not present_dates:
+            return []
+        ranges = []
+        for day in self.sessions(min(present_dates), max(present_dates)):
+            if day in present_dates:
+                continue
+            if ranges and self.previous_session(day) == ranges[-1][1]:
+                ranges[-1] = (ranges[-1][0], day)
+            else:
+                ranges.append((day, day))
+        return ranges
+
+
+def load_calendar(db_path):
+    storage = get_storage(db_path)
+    with storage.transaction():
+        storage.execute(CREATE_NON_TRADING_DAYS)
+    closures = [datetime.strptime(row[0], "%Y-%m-%d").date()
+                for row in storage.query("SELECT date FROM non_trading_days")]
+    return TradingCalendar(closures)
+
+
+def record_closures(db_path, days):
+    storage = get_storage(db_path)
+    with storage.transaction():
+        storage.execute(CREATE_NON_TRADING_DAYS)
+        storage.executemany("INSERT OR IGNORE INTO non_trading_days (date) VALUES (?)",
+                            [(day.isoformat(),) for day in days])
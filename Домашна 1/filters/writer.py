@@ -0,0 +1,124 @@
+import queue
+import sqlite3
+import threading
+
+from database.storage import get_storage
+
+QUEUE_SIZE = 16
+COMMIT_SIZE = 5000
+# How often a producer waiting for room in the queue checks that the writer is still alive
+PUT_POLL_SECONDS = 0.5
+
+INSERT_HISTORICAL_DATA = '''INSERT OR IGNORE INTO historical_data (
+        issuer_code, date, last_price, max_price, min_price, avg_price, percent_change, quantity, turnover_best, total_turnover
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+
+class DatabaseWriter(threading.Thread):
+    """Consumes row batches from a bounded queue and commits them in transactions.
+
+    A batch is a whole issuer or one fetched chunk. Producers block in submit()
+    while the queue is full, so at most queue_size batches are held in memory,
+    and every batch is persisted as soon as its transaction commits instead of
+    at the end of the run. Chunk batches are marked fetched in the journal
+    once the queue runs empty, several per transaction, and committed within
+    the transaction that inserts their rows. If the thread dies, its exception is raised
+    again from the next submit() or close() instead of leaving them waiting.
+    """
+
+    def __init__(self, db_path, prepare=None, queue_size=QUEUE_SIZE, commit_size=COMMIT_SIZE, journal=None):
+        super().__init__(name="DatabaseWriter", daemon=True)
+        self.storage = get_storage(db_path)
+        self.prepare = prepare
+        self.commit_size = commit_size
+        self.journal = journal
+        self.batches = queue.Queue(maxsize=queue_size)
+        self.rows_written = 0
+        self.issuers = set()
+        self.error = None
+
+    @property
+    def issuers_written(self):
+        return len(self.issuers)
+
+    def submit(self, issuer_code, issuer_data, date_range=None):
+        if issuer_data or date_range:
+            self.put((issuer_code, issuer_data, date_range))
+
+    def submit_chunk(self, issuer_code, date_range, rows):
+        self.submit(issuer_code, rows, date_range)
+
+    def close(self):
+        self.put(None)
+        self.join()
+        self.raise_error()
+
+    def put(self, batch):
+        while True:
+            self.raise_error()
+            try:
+                self.batches.put(batch, timeout=PUT_POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def raise_error(self):
+        if self.error is not None:
+            raise self.error
+
+    def run(self):
+        pending = []
+        pending_issuers = set()
+        pending_chunks = []
+        unmarked = 0
+        try:
+            while True:
+                if unmarked and self.batches.empty():
+                    self.mark_fetched(pending_chunks[-unmarked:])
+                    unmarked = 0
+                batch = self.batches.get()
+                if batch is None:
+                    break
+                issuer_code, issuer_data, date_range = batch
+                try:
+                    pending.extend(self.prepare(issuer_data) if self.prepare and issuer_data else issuer_data)
+                except ValueError as e:
+                    print(f"Error formatting data: {e}")
+                    continue
+                if issuer_data:
+                    pending_issuers.add(issuer_code)
+                if date_range:
+                    pending_chunks.append((issuer_code, *date_range))
+                    unmarked += 1
+                if len(pending) >= self.commit_size:
+                    self.commit(pending, pending_issuers, pending_chunks)
+                    pending, pending_issuers, pending_chunks = [], set(), []
+                    unmarked = 0
+            self.commit(pending, pending_issuers, pending_chunks)
+        except BaseException as e:
+            self.error = e
+            raise
+        finally:
+            self.storage.release()
+
+    def mark_fetched(self, chunks):
+        if not self.journal:
+            return
+        try:
+            with self.storage.transaction() as conn:
+                self.journal.mark_fetched(conn, chunks)
+        except sqlite3.Error as e:
+            print(f"Error updating the fetch journal: {e}")
+
+    def commit(self, rows, issuers, chunks):
+        if not rows and not chunks:
+            return
+        try:
+            with self.storage.transaction() as conn:
+                self.storage.executemany(INSERT_HISTORICAL_DATA, rows)
+                if self.journal and chunks:
+                    self.journal.mark_committed(conn, chunks)
+            self.rows_written += len(rows)
+            self.issuers.update(issuers)
+        except sqlite3.Error as e:
+            print(f"Error inserting data: {e}")
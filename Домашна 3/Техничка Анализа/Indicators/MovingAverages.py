@@ -9,12 +9,34 @@ def calculate_ema(data, column, span):
 
     return data[column].ewm(span=span, adjust=False).mean()
 
+def wma_values(values, window, offsets=None):
+    # Linearly weighted mean of each full window as one convolution, instead of
+    # a Python call per row. Like rolling(window).apply, a window that is
+    # incomplete or contains a NaN gives NaN. offsets marks where each series of
+    # a concatenation starts; windows that would span two series give NaN.
+    if window < 1:
+        raise ValueError("window must be an integer 1 or greater")
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(len(values), np.nan)
+    if len(values) < window:
+        return result
+
+    weights = np.arange(1, window + 1, dtype=np.float64)
+    missing = np.isnan(values)
+    weighted = np.convolve(np.where(missing, 0.0, values), weights[::-1], mode="valid") / weights.sum()
+    missing_count = np.cumsum(np.concatenate(([0], missing)))
+    weighted[missing_count[window:] - missing_count[:-window] > 0] = np.nan
+    result[window - 1:] = weighted
+
+    if offsets is not None:
+        offsets = np.asarray(offsets)
+        series_start = np.repeat(offsets[:-1], np.diff(offsets))
+        result[np.arange(len(values)) - window + 1 < series_start] = np.nan
+    return result
+
 def calculate_wma(data, column, window):
 
-    weights = np.arange(1, window + 1)
-    return data[column].rolling(window).apply(
-        lambda prices: np.dot(prices, weights) / weights.sum(), raw=True
-    )
+    return pd.Series(wma_values(data[column].to_numpy(dtype=np.float64), window), index=data.index, name=column)
 
 def calculate_macd(data, column, short_span=12, long_span=26):
 
@@ -27,8 +49,8 @@ def calculate_hma(data, column, window):
     half_window = int(window / 2)
     sqrt_window = int(np.sqrt(window))
 
-    wma_half = calculate_wma(data, column, half_window)
-    wma_full = calculate_wma(data, column, window)
-    hma = calculate_wma(data.assign(temp=2 * wma_half - wma_full), "temp", sqrt_window)
+    values = data[column].to_numpy(dtype=np.float64)
+    raw_hma = 2 * wma_values(values, half_window) - wma_values(values, window)
+    hma = wma_values(raw_hma, sqrt_window)
 
-    return hma
+    return pd.Series(hma, index=data.index, name=column)
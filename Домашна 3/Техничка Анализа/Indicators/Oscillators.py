@@ -1,5 +1,10 @@
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Windows per block in rolling_mad; bounds the scratch buffer to about
+# MAD_BLOCK_WINDOWS * period floats however long the input is.
+MAD_BLOCK_WINDOWS = 8192
 
 
 def calculate_rsi(data, column, period=14):
@@ -28,10 +33,47 @@ def calculate_stochastic(data, high_col, low_col, close_col, k_period=14, d_peri
     })
 
 
+def rolling_mad(values, period, offsets=None):
+    """Mean absolute deviation of every full window of `period` values.
+
+    Same result as rolling(period).apply(lambda x: np.abs(x - x.mean()).mean()):
+    NaN for the first period - 1 positions and for any window holding a NaN.
+    The windows are strided views, evaluated a block at a time into one reused
+    buffer. For many issuers at once pass their series concatenated, with
+    offsets marking where each one starts (as OHLCVPanel.offsets does), or a
+    2-D array with one series per row; windows never cross two series.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 2:
+        length = values.shape[1]
+        return rolling_mad(values.ravel(), period, np.arange(values.shape[0] + 1) * length).reshape(values.shape)
+
+    result = np.full(len(values), np.nan)
+    if len(values) < period:
+        return result
+    windows = sliding_window_view(values, period)
+    block_size = min(MAD_BLOCK_WINDOWS, len(windows))
+    buffer = np.empty((block_size, period))
+    means = np.empty((block_size, 1))
+    for start in range(0, len(windows), block_size):
+        block = windows[start:start + block_size]
+        rows = len(block)
+        np.mean(block, axis=1, keepdims=True, out=means[:rows])
+        np.subtract(block, means[:rows], out=buffer[:rows])
+        np.abs(buffer[:rows], out=buffer[:rows])
+        np.mean(buffer[:rows], axis=1, out=result[period - 1 + start:period - 1 + start + rows])
+
+    if offsets is not None:
+        offsets = np.asarray(offsets)
+        series_start = np.repeat(offsets[:-1], np.diff(offsets))
+        result[np.arange(len(values)) - period + 1 < series_start] = np.nan
+    return result
+
+
 def calculate_cci(data, high_col, low_col, close_col, period=20):
     tp = (data[high_col] + data[low_col] + data[close_col]) / 3
     sma_tp = tp.rolling(window=period).mean()
-    mad = tp.rolling(window=period).apply(lambda x: np.abs(x - x.mean()).mean())
+    mad = pd.Series(rolling_mad(tp.to_numpy(dtype=np.float64), period), index=tp.index)
     cci = (tp - sma_tp) / (0.015 * mad)
 
     return cci
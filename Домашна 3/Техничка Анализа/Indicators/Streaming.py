@@ -0,0 +1,272 @@
+import copy
+import math
+from collections import deque
+
+import numpy as np
+
+# Streaming counterparts of the batch indicators: each keeps only what it needs
+# from past bars (a window of values, a running mean) and produces the value
+# for one new bar in O(1) or O(window) work. state() / load() turn that into
+# plain JSON-able lists and numbers so it can be persisted between runs.
+# Each one repeats the arithmetic of the pandas function it stands in for, in
+# the same order, so streamed values equal the batch ones bit for bit; NaN rules
+# follow too: a rolling window gives NaN until it is full and while it holds a NaN.
+
+NAN = float('nan')
+
+
+def ratio(numerator, denominator):
+    # Division as on float64 arrays: x / 0 is a signed inf (0 / 0 NaN) rather than ZeroDivisionError
+    if denominator:
+        return numerator / denominator
+    if numerator != numerator or numerator == 0:
+        return NAN
+    return math.copysign(math.inf, numerator) * math.copysign(1.0, denominator)
+
+
+def is_full(values):
+    return len(values) == values.maxlen and not any(value != value for value in values)
+
+
+def window_max(values):
+    return max(values) if is_full(values) else NAN
+
+
+def window_min(values):
+    return min(values) if is_full(values) else NAN
+
+
+class StreamingIndicator:
+    def state(self):
+        state = {}
+        for name, value in vars(self).items():
+            if isinstance(value, StreamingIndicator):
+                value = value.state()
+            elif isinstance(value, deque):
+                value = list(value)
+            state[name] = value
+        return state
+
+    def load(self, state):
+        for name, value in state.items():
+            current = getattr(self, name)
+            if isinstance(current, StreamingIndicator):
+                current.load(value)
+            elif isinstance(current, deque):
+                setattr(self, name, deque(value, maxlen=current.maxlen))
+            else:
+                setattr(self, name, value)
+        return self
+
+
+class RollingMean(StreamingIndicator):
+    """rolling(window).mean() the way pandas computes it.
+
+    pandas keeps one Kahan-compensated running sum for the whole series,
+    adding each value as it enters the window and subtracting it as it
+    leaves, returns a run of equal values exactly and clamps the sign when
+    every value has the same sign. Keeping that same state here (rather than
+    summing the window afresh) is what makes the results identical.
+    """
+
+    def __init__(self, window):
+        self.values = deque(maxlen=window)
+        self.count = 0
+        self.negatives = 0
+        self.total = 0.0
+        self.add_compensation = 0.0
+        self.remove_compensation = 0.0
+        self.same_run = 0
+        self.previous = NAN
+
+    def update(self, value):
+        if len(self.values) == self.values.maxlen:
+            self.remove(self.values[0])
+        self.values.append(value)
+        self.add(value)
+        return self.mean()
+
+    def add(self, value):
+        if value != value:
+            return
+        self.count += 1
+        y = value - self.add_compensation
+        t = self.total + y
+        self.add_compensation = t - self.total - y
+        self.total = t
+        if np.signbit(value):
+            self.negatives += 1
+        self.same_run = self.same_run + 1 if value == self.previous else 1
+        self.previous = value
+
+    def remove(self, value):
+        if value != value:
+            return
+        self.count -= 1
+        y = -value - self.remove_compensation
+        t = self.total + y
+        self.remove_compensation = t - self.total - y
+        self.total = t
+        if np.signbit(value):
+            self.negatives -= 1
+
+    def mean(self):
+        if self.count < self.values.maxlen or self.count == 0:
+            return NAN
+        if self.same_run >= self.count:
+            return self.previous
+        result = self.total / self.count
+        if self.negatives == 0 and result < 0:
+            return 0.0
+        if self.negatives == self.count and result > 0:
+            return 0.0
+        return result
+
+
+class SMA(RollingMean):
+    pass
+
+
+class EMA(StreamingIndicator):
+    """ewm(span=span, adjust=False).mean(), one observation at a time, NaNs included."""
+
+    def __init__(self, span):
+        self.alpha = 1.0 / (1.0 + (span - 1) / 2.0)
+        self.mean = NAN
+        self.old_weight = 1.0
+
+    def update(self, value):
+        if self.mean == self.mean:
+            self.old_weight *= 1.0 - self.alpha
+            if value == value:
+                if self.mean != value:
+                    self.mean = (self.old_weight * self.mean + self.alpha * value) / (self.old_weight + self.alpha)
+                self.old_weight = 1.0
+        elif value == value:
+            self.mean = value
+        return self.mean
+
+
+class MACD(StreamingIndicator):
+    def __init__(self, fast=12, slow=26):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+
+    def update(self, value):
+        return self.fast.update(value) - self.slow.update(value)
+
+
+class RSI(StreamingIndicator):
+    def __init__(self, period=14):
+        self.previous = NAN
+        self.gains = RollingMean(period)
+        self.losses = RollingMean(period)
+
+    def update(self, close):
+        delta = close - self.previous
+        self.previous = close
+        # delta.where(delta > 0, 0) and -delta.where(delta < 0, 0): the first bar counts as 0
+        avg_gain = self.gains.update(delta if delta > 0 else 0.0)
+        avg_loss = self.losses.update(-delta if delta < 0 else -0.0)
+        rs = ratio(avg_gain, avg_loss)
+        return 100 - ratio(100, 1 + rs)
+
+
+class Stochastic(StreamingIndicator):
+    """(%K, %D) as calculate_stochastic's K_line and D_line."""
+
+    def __init__(self, k_period=14, d_period=3):
+        self.highs = deque(maxlen=k_period)
+        self.lows = deque(maxlen=k_period)
+        self.d_line = RollingMean(d_period)
+
+    def update(self, high, low, close):
+        self.highs.append(high)
+        self.lows.append(low)
+        lowest_low = window_min(self.lows)
+        k_line = 100 * ratio(close - lowest_low, window_max(self.highs) - lowest_low)
+        return k_line, self.d_line.update(k_line)
+
+
+class WilliamsR(StreamingIndicator):
+    def __init__(self, period=14):
+        self.highs = deque(maxlen=period)
+        self.lows = deque(maxlen=period)
+
+    def update(self, high, low, close):
+        self.highs.append(high)
+        self.lows.append(low)
+        highest_high = window_max(self.highs)
+        return -100 * ratio(highest_high - close, highest_high - window_min(self.lows))
+
+
+class CCI(StreamingIndicator):
+    def __init__(self, period=20):
+        self.sma_tp = RollingMean(period)
+
+    def update(self, high, low, close):
+        tp = (high + low + close) / 3
+        sma_tp = self.sma_tp.update(tp)
+        if not is_full(self.sma_tp.values):
+            return NAN
+        # As rolling_mad: NumPy means over the window, not the running sum
+        window = np.array(self.sma_tp.values)
+        mad = np.abs(window - window.mean()).mean()
+        return ratio(tp - sma_tp, 0.015 * mad)
+
+
+class ATR(StreamingIndicator):
+    def __init__(self, period=14):
+        self.previous_close = NAN
+        self.true_ranges = RollingMean(period)
+
+    def update(self, high, low, close):
+        ranges = [value for value in (high - low, abs(high - self.previous_close), abs(low - self.previous_close))
+                  if value == value]
+        self.previous_close = close
+        return self.true_ranges.update(max(ranges) if ranges else NAN)
+
+
+class PriceChange(StreamingIndicator):
+    def __init__(self):
+        self.previous = NAN
+
+    def update(self, close):
+        change = ratio(close, self.previous) - 1
+        self.previous = close
+        return change
+
+
+class IndicatorStream:
+    """A set of streaming indicators over one issuer's bars at one timeframe.
+
+    indicators is a list of (output columns, indicator, input columns); an
+    indicator with several outputs (the stochastic) returns them as a tuple.
+    """
+
+    def __init__(self, indicators):
+        self.indicators = indicators
+
+    @property
+    def columns(self):
+        return [name for outputs, _, _ in self.indicators for name in outputs]
+
+    def update(self, bar):
+        """Fold one closed bar into the state; returns {output column: value} for it."""
+        values = {}
+        for outputs, indicator, inputs in self.indicators:
+            result = indicator.update(*(float(bar[name]) for name in inputs))
+            values.update(zip(outputs, result if len(outputs) > 1 else (result,)))
+        return values
+
+    def peek(self, bar):
+        """Values for a bar that may still change (the current week or month), leaving the state as it was."""
+        return copy.deepcopy(self).update(bar)
+
+    def state(self):
+        return [indicator.state() for _, indicator, _ in self.indicators]
+
+    def load(self, state):
+        for (_, indicator, _), indicator_state in zip(self.indicators, state):
+            indicator.load(indicator_state)
+        return self
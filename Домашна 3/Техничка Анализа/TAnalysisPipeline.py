@@ -1,25 +1,100 @@
-import sqlite3
+import argparse
+import json
+import os
+import sys
 from Indicators.MovingAverages import *
 from Indicators.Oscillators import *
-from concurrent.futures import ThreadPoolExecutor
+from Indicators import Engine, Streaming
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../Домашна 1"))
+from database import indicator_state
+from database.bars import open_bars
+from database.columnar import open_history
+from database.result_cache import ResultCache, version_tag
+from database.shared_panel import SharedPanel
+from database.storage import get_storage
+
+PANEL_COLUMNS = {
+    'last_price': 'Last Price',
+    'max_price': 'Max Price',
+    'min_price': 'Min Price',
+    'avg_price': 'Avg Price',
+    'quantity': 'Quantity'
+}
+
+TIMEFRAMES = {
+    'Daily': 'D',
+    'Weekly': 'W',
+    'Monthly': 'M'
+}
+RESAMPLE_RULES = {'W': 'W', 'M': 'ME'}
+BAR_AGGREGATIONS = {
+    'Last Price': 'last',
+    'Max Price': 'max',
+    'Min Price': 'min',
+    'Avg Price': 'mean',
+    'Quantity': 'sum'
+}
+
+LAST, HIGH, LOW = Engine.column('Last Price'), Engine.column('Max Price'), Engine.column('Min Price')
+TECHNICAL_INDICATORS = {
+    'SMA_20': Engine.sma(LAST, 20),
+    'EMA_10': Engine.ema(LAST, 10),
+    'WMA_30': Engine.wma(LAST, 30),
+    'MACD': Engine.macd(LAST),
+    'HMA_50': Engine.hma(LAST, 50),
+    'RSI': Engine.rsi(LAST),
+    'STOCH_K': Engine.stochastic_k(HIGH, LOW, LAST),
+    'STOCH_D': Engine.stochastic_d(HIGH, LOW, LAST),
+    'CCI': Engine.cci(HIGH, LOW, LAST),
+    'MOMENTUM': Engine.momentum(LAST),
+    'WILLIAMS_R': Engine.williams_r(HIGH, LOW, LAST),
+}
+
+# Cached results are stored under this version; bump the name when generate_signals changes.
+INDICATOR_SET_VERSION = version_tag('technical-v1', TECHNICAL_INDICATORS)
+
+# Persisted under this name in indicator_state; change it when the set changes.
+STREAMING_SET = 'technical-v1'
+
+# Each worker process gets several chunks of issuers, so one holding the
+# longest histories does not leave the others idle at the end.
+CHUNKS_PER_WORKER = 4
+
+
+def streaming_indicators():
+    # The TECHNICAL_INDICATORS that generate_signals reads, as streaming state
+    return Streaming.IndicatorStream([
+        (('SMA_20',), Streaming.SMA(20), ('Last Price',)),
+        (('EMA_10',), Streaming.EMA(10), ('Last Price',)),
+        (('MACD',), Streaming.MACD(), ('Last Price',)),
+        (('RSI',), Streaming.RSI(), ('Last Price',)),
+        (('STOCH_K', 'STOCH_D'), Streaming.Stochastic(), ('Max Price', 'Min Price', 'Last Price')),
+        (('CCI',), Streaming.CCI(), ('Max Price', 'Min Price', 'Last Price')),
+        (('WILLIAMS_R',), Streaming.WilliamsR(), ('Max Price', 'Min Price', 'Last Price')),
+    ])
 
 
 class StockAnalyzer:
-    def __init__(self, db_path):
+    def __init__(self, db_path=None, panel=None, bars=None):
+        # With a panel (see database.panel.load_panel) every issuer is read from
+        # memory; a db_path alone falls back to one query per issuer. bars is
+        # database.bars.open_bars(): the weekly and monthly bars, read instead
+        # of resampling the daily rows.
         self.db_path = db_path
+        self.panel = panel
+        self.bars = bars
+        self.storage = get_storage(db_path) if db_path else None
+        self.engine = Engine.IndicatorEngine(TECHNICAL_INDICATORS)
 
     def get_all_issuers(self):
+        if self.panel is not None:
+            return list(self.panel.issuers)
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
             query = "SELECT DISTINCT issuer_code FROM historical_data"
-            cursor.execute(query)
-
-            issuers = [row[0] for row in cursor.fetchall()]
-            conn.close()
-
-            return issuers
+            return [row[0] for row in self.storage.query(query)]
 
         except Exception as e:
             return []
@@ -27,40 +102,43 @@ class StockAnalyzer:
     def get_data(self, issuer_code):
 
         try:
-            conn = sqlite3.connect(self.db_path)
-            query = """
-            SELECT date,
-                   last_price AS "Last Price",
-                   max_price AS "Max Price",
-                   min_price AS "Min Price",
-                   avg_price AS "Avg Price",
-                   quantity AS "Quantity"
-            FROM historical_data
-            WHERE issuer_code = ?
-            ORDER BY date ASC
-            """
-
-            data = pd.read_sql_query(query, conn, params=(issuer_code,))
-            conn.close()
-
-            data['date'] = pd.to_datetime(data['date'])
+            if self.panel is not None:
+                if issuer_code not in self.panel:
+                    return None
+                data = self.panel.frame(issuer_code, PANEL_COLUMNS)
+            else:
+                data = self.query_data(issuer_code)
 
             if len(data) < 10:
                 return None
 
-            price_cols = ['Last Price', 'Max Price', 'Min Price', 'Avg Price']
-            for col in price_cols:
-                data[col] = data[col].apply(lambda x: float(str(x).replace('.', '').replace(',', '.'))
-                if pd.notna(x) and x != '' else 0.0)
-
-            data['Quantity'] = data['Quantity'].apply(lambda x: float(str(x).replace('.', '').replace(',', '.'))
-            if pd.notna(x) and x != '' else 0.0)
+            # Prices and quantities are stored as REAL/INTEGER, so they load as numbers already
+            numeric_cols = list(PANEL_COLUMNS.values())
+            data[numeric_cols] = data[numeric_cols].astype('float64').fillna(0.0)
 
             return data
 
         except Exception as e:
             return None
 
+    def query_data(self, issuer_code):
+        query = """
+        SELECT date,
+               last_price AS "Last Price",
+               max_price AS "Max Price",
+               min_price AS "Min Price",
+               avg_price AS "Avg Price",
+               quantity AS "Quantity"
+        FROM historical_data
+        WHERE issuer_code = ?
+        ORDER BY date ASC
+        """
+
+        data = self.storage.read_frame(query, params=(issuer_code,))
+        # Same resolution as OHLCVPanel.frame, whatever pandas infers from the text
+        data['date'] = pd.to_datetime(data['date']).astype('datetime64[ns]')
+        return data
+
     def analyze_issuer(self, issuer_code):
 
         try:
@@ -68,15 +146,9 @@ class StockAnalyzer:
             if data is None:
                 return None
 
-            timeframes = {
-                'Daily': 'D',
-                'Weekly': 'W',
-                'Monthly': 'M'
-            }
-
             results = {}
-            for name, timeframe in timeframes.items():
-                df_indicators = self.calculate_all_indicators(data, timeframe)
+            for name, timeframe in TIMEFRAMES.items():
+                df_indicators = self.calculate_all_indicators(data, timeframe, issuer_code)
                 signals = self.generate_signals(df_indicators)
 
                 results[name] = {
@@ -89,45 +161,184 @@ class StockAnalyzer:
         except Exception as e:
             return None
 
-    def calculate_all_indicators(self, data, timeframe='D'):
+    def calculate_all_indicators(self, data, timeframe='D', issuer_code=None):
 
         df = data.copy()
 
-        if timeframe == 'W':
-            df = df.resample('W', on='date').agg({
-                'Last Price': 'last',
-                'Max Price': 'max',
-                'Min Price': 'min',
-                'Avg Price': 'mean',
-                'Quantity': 'sum'
-            }).dropna()
-        elif timeframe == 'M':
-            df = df.resample('ME', on='date').agg({
-                'Last Price': 'last',
-                'Max Price': 'max',
-                'Min Price': 'min',
-                'Avg Price': 'mean',
-                'Quantity': 'sum'
-            }).dropna()
+        if timeframe in RESAMPLE_RULES:
+            if self.has_bars(timeframe, [issuer_code]):
+                df = self.bars[timeframe].frame(issuer_code, PANEL_COLUMNS).set_index('date')
+            else:
+                df = df.resample(RESAMPLE_RULES[timeframe], on='date').agg(BAR_AGGREGATIONS).dropna()
         else:
 
             df = df.set_index('date').sort_index()
 
-        df['SMA_20'] = calculate_sma(df, 'Last Price', 20)
-        df['EMA_10'] = calculate_ema(df, 'Last Price', 10)
-        df['WMA_30'] = calculate_wma(df, 'Last Price', 30)
-        df['MACD'] = calculate_macd(df, 'Last Price')
-        df['HMA_50'] = calculate_hma(df, 'Last Price', 50)
+        # Shared intermediates (rolling max/min, typical price, WMAs) are computed once
+        return self.engine.apply(df)
+
+    def has_bars(self, timeframe, issuers):
+        return self.bars is not None and all(issuer_code in self.bars[timeframe] for issuer_code in issuers)
+
+    def calculate_panel_indicators(self, frames, timeframe='D', issuers=None):
+        # calculate_all_indicators for many issuers in one pass: the frames are
+        # concatenated, resampled per issuer with a single groupby, and the
+        # engine runs segmented rolling operations over all of them at once.
+        # Given the issuers' codes, weekly and monthly bars are read from
+        # self.bars instead of resampled. Returns the combined frame, issuers
+        # back to back in the order given, and the offsets delimiting each
+        # issuer's rows.
+        if timeframe in RESAMPLE_RULES and issuers is not None and self.has_bars(timeframe, issuers):
+            bars = [self.bars[timeframe].frame(issuer_code, PANEL_COLUMNS) for issuer_code in issuers]
+            offsets = np.r_[0, np.cumsum([len(frame) for frame in bars])]
+            df = pd.concat(bars, ignore_index=True).set_index('date')
+            return self.engine.apply(df, offsets), offsets
+
+        df = pd.concat(frames, ignore_index=True)
+        df['issuer'] = np.repeat(np.arange(len(frames)), [len(frame) for frame in frames])
+
+        if timeframe in RESAMPLE_RULES:
+            bars = pd.Grouper(key='date', freq=RESAMPLE_RULES[timeframe])
+            df = df.groupby(['issuer', bars]).agg(BAR_AGGREGATIONS).dropna()
+            issuers = df.index.get_level_values('issuer')
+            df = df.droplevel('issuer')
+        else:
+            df = df.sort_values(['issuer', 'date'], kind='stable').set_index('date')
+            issuers = df.pop('issuer')
+
+        offsets = np.r_[0, np.cumsum(np.bincount(issuers, minlength=len(frames)))]
+        return self.engine.apply(df, offsets), offsets
 
-        df['RSI'] = calculate_rsi(df, 'Last Price')
-        stoch = calculate_stochastic(df, 'Max Price', 'Min Price', 'Last Price')
-        df['STOCH_K'] = stoch['K_line']
-        df['STOCH_D'] = stoch['D_line']
-        df['CCI'] = calculate_cci(df, 'Max Price', 'Min Price', 'Last Price')
-        df['MOMENTUM'] = calculate_momentum(df, 'Last Price')
-        df['WILLIAMS_R'] = calculate_williams_r(df, 'Max Price', 'Min Price', 'Last Price')
+    def analyze_panel(self, issuers):
+        # Same results as analyze_issuer for each issuer, with one indicator and
+        # signal pass per timeframe instead of one per issuer and timeframe.
+        frames = {}
+        for issuer_code in issuers:
+            data = self.get_data(issuer_code)
+            if data is not None:
+                frames[issuer_code] = data
+        if not frames:
+            return {}
+
+        results = {issuer_code: {} for issuer_code in frames}
+        for name, timeframe in TIMEFRAMES.items():
+            df_indicators, offsets = self.calculate_panel_indicators(list(frames.values()), timeframe, list(frames))
+            signals = self.generate_signals(df_indicators)
+            for i, issuer_code in enumerate(frames):
+                start, end = offsets[i], offsets[i + 1]
+                results[issuer_code][name] = {
+                    'indicators': df_indicators.iloc[start:end],
+                    'signals': signals.iloc[start:end]
+                }
 
-        return df
+        return results
+
+    def watermark(self, issuer_code):
+        # (last bar date, row count): cached results stay valid until it moves
+        if self.panel is not None:
+            dates = self.panel.slice(issuer_code)['date'] if issuer_code in self.panel else []
+            return (str(dates[-1]) if len(dates) else None), len(dates)
+        return tuple(self.storage.query("SELECT MAX(date), COUNT(*) FROM historical_data WHERE issuer_code = ?",
+                                        (issuer_code,))[0])
+
+    def cached_results(self, cache, issuers):
+        # Results of the issuers whose every timeframe is cached under their
+        # current watermark, and the issuers that need computing.
+        cached, stale = {}, []
+        for issuer_code in issuers:
+            last_date, rows = self.watermark(issuer_code)
+            results = {}
+            for name in TIMEFRAMES:
+                result = cache.get(issuer_code, name, INDICATOR_SET_VERSION, last_date, rows)
+                if result is None:
+                    break
+                results[name] = result
+            if len(results) == len(TIMEFRAMES):
+                cached[issuer_code] = results
+            else:
+                stale.append(issuer_code)
+        return cached, stale
+
+    def cache_results(self, cache, results):
+        for issuer_code, timeframe_results in results.items():
+            last_date, rows = self.watermark(issuer_code)
+            for name, result in timeframe_results.items():
+                cache.put(issuer_code, name, INDICATOR_SET_VERSION, last_date, rows, result)
+
+    def stream_bars(self, daily, timeframe):
+        # Bars built from daily rows and how many of them are closed; the last
+        # weekly or monthly bar is still open until a later period has data.
+        if timeframe in RESAMPLE_RULES:
+            bars = daily.resample(RESAMPLE_RULES[timeframe], on='date').agg(BAR_AGGREGATIONS).dropna()
+            return bars, max(len(bars) - 1, 0)
+        bars = daily.set_index('date')
+        return bars, len(bars)
+
+    def stream_issuer(self, issuer_code, states):
+        # analyze_issuer for only the bars after the persisted streaming state.
+        # states is indicator_state.load_states(); returns the results for the
+        # new bars and the states to save back.
+        data = self.get_data(issuer_code)
+        if data is None:
+            return {}, {}
+
+        results, new_states = {}, {}
+        for name, timeframe in TIMEFRAMES.items():
+            stream = streaming_indicators()
+            consumed = 0
+            if (issuer_code, timeframe) in states:
+                last_date, rows, state = states[(issuer_code, timeframe)]
+                # A refetch that added older rows invalidates the state; replay from the start.
+                if int((data['date'] <= pd.Timestamp(last_date)).sum()) == rows:
+                    stream.load(state)
+                    consumed = rows
+
+            daily = data.iloc[consumed:]
+            bars, closed = self.stream_bars(daily, timeframe)
+            if bars.empty:
+                continue
+            records = bars.to_dict('records')
+            values = [stream.update(bar) for bar in records[:closed]]
+            values += [stream.peek(bar) for bar in records[closed:]]
+
+            df_indicators = bars.join(pd.DataFrame(values, index=bars.index, columns=stream.columns))
+            results[name] = {
+                'indicators': df_indicators,
+                'signals': self.generate_signals(df_indicators)
+            }
+            if closed:
+                closed_rows = int((daily['date'] <= bars.index[closed - 1]).sum())
+                last_date = daily['date'].iloc[closed_rows - 1].strftime('%Y-%m-%d')
+                new_states[(issuer_code, timeframe)] = (last_date, consumed + closed_rows, stream.state())
+
+        return results, new_states
+
+    def verify_streaming(self, issuer_code, rtol=0.0, atol=0.0):
+        # Replays every bar of every timeframe through streaming_indicators(),
+        # round-tripping the state through JSON halfway, and compares each
+        # streamed column with calculate_all_indicators. Returns
+        # {(timeframe, column): number of differing bars}.
+        data = self.get_data(issuer_code)
+        if data is None:
+            return {}
+
+        mismatches = {}
+        for name, timeframe in TIMEFRAMES.items():
+            batch = self.calculate_all_indicators(data, timeframe)
+            records = batch[list(BAR_AGGREGATIONS)].to_dict('records')
+            stream = streaming_indicators()
+            values = [stream.update(bar) for bar in records[:len(records) // 2]]
+            stream = streaming_indicators().load(json.loads(json.dumps(stream.state())))
+            values += [stream.update(bar) for bar in records[len(records) // 2:]]
+
+            streamed = pd.DataFrame(values, index=batch.index, columns=stream.columns)
+            for column in stream.columns:
+                same = np.isclose(streamed[column].to_numpy(), batch[column].to_numpy(),
+                                  rtol=rtol, atol=atol, equal_nan=True)
+                if not same.all():
+                    mismatches[(name, column)] = int((~same).sum())
+
+        return mismatches
 
     def generate_signals(self, df):
 
@@ -194,28 +405,219 @@ class StockAnalyzer:
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Technical indicators and signals for every issuer.")
+    parser.add_argument("--per-issuer", action="store_true",
+                        help="analyze issuers one at a time instead of in one segmented pass")
+    parser.add_argument("--streaming", action="store_true",
+                        help="only fold bars added since the last run into the persisted indicator state")
+    parser.add_argument("--verify-streaming", action="store_true",
+                        help="compare the streaming indicators with the batch functions and exit")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="recompute every issuer instead of reusing results for unchanged issuers")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processes computing indicators (default: one per core); 1 computes in this process")
+    args = parser.parse_args()
+
     db_path = '..\..\Домашна 1\database\macedonian_stock_exchange.db'
 
-    analyzer = StockAnalyzer(db_path)
+    # Memory-mapped columnar store when current, else one ordered pass over historical_data;
+    # the weekly and monthly bars when the ingestion pipeline has brought them up to date too
+    panel = open_history(db_path)
+    analyzer = StockAnalyzer(panel=panel, bars=open_bars(db_path))
 
     issuers = analyzer.get_all_issuers()
     print(f"From {len(issuers)} issuers to analyze")
 
-    all_results = {}
-    with ThreadPoolExecutor(max_workers=100) as executor:
-        futures = {executor.submit(analyzer.analyze_issuer, issuer): issuer for issuer in issuers}
+    if args.verify_streaming:
+        return verify_streaming(analyzer, issuers)
 
-        for future in futures:
-            issuer = futures[future]
+    all_results = {}
+    if args.streaming:
+        states = indicator_state.load_states(STREAMING_SET, db_path)
+        new_states = {}
+        for issuer in issuers:
             try:
-                result = future.result()
-                if result:
-                    all_results.update(result)
+                results, issuer_states = analyzer.stream_issuer(issuer, states)
             except Exception as e:
                 print(f"Error processing {issuer}: {str(e)}")
+                continue
+            if results:
+                all_results[issuer] = results
+            new_states.update(issuer_states)
+        indicator_state.save_states(STREAMING_SET, new_states, db_path)
+        print(f"Streaming: advanced {len(new_states)} issuer/timeframe states")
+    else:
+        cache = None if args.no_cache else ResultCache()
+        cached, stale = analyzer.cached_results(cache, issuers) if cache else ({}, issuers)
+        print(f"{len(stale)} issuers with new rows to analyze, {len(cached)} unchanged")
+        all_results = compute_results(analyzer, stale, args.per_issuer, args.workers)
+        if cache:
+            analyzer.cache_results(cache, all_results)
+            print(f"Result cache: {cache.summary()}")
+            cache.close()
+        all_results.update(cached)
 
     analyzer.save_results(all_results)
 
+    if not args.streaming:
+        print(f"Indicator engine: {analyzer.engine.stats.summary()}")
+
+    stats = get_storage(db_path).stats
+    print(f"SQLite: {stats.connections_opened} connections opened, "
+          f"{stats.queries} queries in {stats.query_time:.2f} seconds")
+
+
+def compute_results(analyzer, issuers, per_issuer=False, workers=1):
+    if workers > 1 and analyzer.panel is not None and len(issuers) > 1:
+        return compute_results_in_processes(analyzer, issuers, per_issuer, workers)
+
+    all_results = {}
+    if per_issuer:
+        with ThreadPoolExecutor(max_workers=100) as executor:
+            futures = {executor.submit(analyzer.analyze_issuer, issuer): issuer for issuer in issuers}
+
+            for future in futures:
+                issuer = futures[future]
+                try:
+                    result = future.result()
+                    if result:
+                        all_results.update(result)
+                except Exception as e:
+                    print(f"Error processing {issuer}: {str(e)}")
+    else:
+        all_results = analyzer.analyze_panel(issuers)
+    return all_results
+
+
+def compute_results_in_processes(analyzer, issuers, per_issuer, workers):
+    # compute_results on a pool of processes. The issuers' rows (and bars) are
+    # copied into shared memory once; workers attach to it, analyze a chunk of
+    # issuers per task and send the frames back packed as arrays.
+    issuers = [issuer for issuer in issuers if issuer in analyzer.panel]
+    chunk_size = -(-len(issuers) // (workers * CHUNKS_PER_WORKER))
+    chunks = [issuers[i:i + chunk_size] for i in range(0, len(issuers), chunk_size)]
+
+    chunk_results = {}
+    with ExitStack() as stack:
+        shared = stack.enter_context(SharedPanel.create(analyzer.panel, issuers, list(PANEL_COLUMNS)))
+        bar_specs = None
+        if analyzer.bars is not None:
+            bar_specs = {timeframe: stack.enter_context(SharedPanel.create(bars, issuers, list(PANEL_COLUMNS))).spec
+                         for timeframe, bars in analyzer.bars.items()}
+        executor = stack.enter_context(ProcessPoolExecutor(max_workers=workers, initializer=attach_worker,
+                                                           initargs=(shared.spec, bar_specs)))
+        futures = {executor.submit(analyze_chunk, chunk, per_issuer): i for i, chunk in enumerate(chunks)}
+        for future in as_completed(futures):
+            chunk = chunks[futures[future]]
+            try:
+                packed, stats = future.result()
+            except Exception as e:
+                print(f"Error processing {len(chunk)} issuers from {chunk[0]}: {str(e)}")
+                continue
+            chunk_results[futures[future]] = unpack_results(packed)
+            analyzer.engine.stats.record(*stats)
+
+    all_results = {}
+    for i in sorted(chunk_results):
+        all_results.update(chunk_results[i])
+    return all_results
+
+
+# The analyzer of a worker process, over its attached SharedPanels
+worker_panel = None
+worker_bars = None
+worker_analyzer = None
+
+
+def attach_worker(spec, bar_specs=None):
+    global worker_panel, worker_bars, worker_analyzer
+    worker_panel = SharedPanel.attach(spec)
+    worker_bars = {timeframe: SharedPanel.attach(bar_spec) for timeframe, bar_spec in (bar_specs or {}).items()}
+    bars = {timeframe: shared.panel for timeframe, shared in worker_bars.items()} if bar_specs else None
+    worker_analyzer = StockAnalyzer(panel=worker_panel.panel, bars=bars)
+
+
+def analyze_chunk(issuers, per_issuer):
+    # One task of compute_results_in_processes: the packed results for a chunk
+    # of issuers and the engine stats of computing them.
+    analyzer = worker_analyzer
+    analyzer.engine.stats = Engine.EngineStats()
+    if per_issuer:
+        results = {}
+        for issuer in issuers:
+            result = analyzer.analyze_issuer(issuer)
+            if result:
+                results.update(result)
+    else:
+        results = analyzer.analyze_panel(issuers)
+    stats = analyzer.engine.stats
+    return pack_results(results), (stats.computed, stats.saved, stats.series)
+
+
+def pack_frame(df):
+    # A frame as plain arrays: numeric and datetime columns as they are, text
+    # labels as int8 codes into their few distinct values (-1 for missing).
+    # Far smaller to pickle than the DataFrame and its per-cell strings.
+    columns = []
+    for name, series in df.items():
+        if series.dtype.kind in 'fiub' or series.dtype.kind == 'M':
+            columns.append((name, series.dtype, series.to_numpy(), None))
+        else:
+            codes, labels = pd.factorize(series)
+            codes = codes.astype(np.int8 if len(labels) < 128 else np.int32)
+            columns.append((name, series.dtype, codes, np.asarray(labels, dtype=object)))
+    return df.index.to_numpy(), df.index.name, columns
+
+
+def unpack_frame(packed):
+    index, index_name, columns = packed
+    data = {}
+    for name, dtype, values, labels in columns:
+        if labels is not None:
+            # Code -1 picks the appended NaN
+            values = pd.array(np.append(labels, np.nan)[values], dtype=dtype)
+        data[name] = values
+    return pd.DataFrame(data, index=pd.DatetimeIndex(index, name=index_name))
+
+
+def pack_results(results):
+    # {timeframe: (issuers, offsets, packed indicators, packed signals)}, each
+    # timeframe's frames for every issuer of the chunk packed back to back.
+    packed = {}
+    for name in TIMEFRAMES:
+        issuers = [issuer for issuer, timeframe_results in results.items() if name in timeframe_results]
+        if not issuers:
+            continue
+        indicators = [results[issuer][name]['indicators'] for issuer in issuers]
+        signals = [results[issuer][name]['signals'] for issuer in issuers]
+        offsets = np.r_[0, np.cumsum([len(frame) for frame in indicators])]
+        packed[name] = (issuers, offsets, pack_frame(pd.concat(indicators)), pack_frame(pd.concat(signals)))
+    return packed
+
+
+def unpack_results(packed):
+    results = {}
+    for name, (issuers, offsets, indicators, signals) in packed.items():
+        indicators, signals = unpack_frame(indicators), unpack_frame(signals)
+        for i, issuer in enumerate(issuers):
+            start, end = offsets[i], offsets[i + 1]
+            results.setdefault(issuer, {})[name] = {
+                'indicators': indicators.iloc[start:end],
+                'signals': signals.iloc[start:end]
+            }
+    return results
+
+
+def verify_streaming(analyzer, issuers):
+    failures = 0
+    for issuer in issuers:
+        mismatches = analyzer.verify_streaming(issuer)
+        for (timeframe, column), count in mismatches.items():
+            print(f"MISMATCH {issuer} {timeframe} {column}: {count} bars differ from the batch indicator")
+        failures += bool(mismatches)
+    print(f"Streaming indicators verified for {len(issuers)} issuers, {failures} with mismatches")
+    return 1 if failures else 0
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,86 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from Indicators.Oscillators import calculate_cci, rolling_mad
+
+CCI_PERIOD = 20
+
+
+def previous_calculate_cci(data, high_col, low_col, close_col, period=20):
+    """calculate_cci before the rolling_mad kernel: a Python lambda per row for the deviation."""
+    tp = (data[high_col] + data[low_col] + data[close_col]) / 3
+    sma_tp = tp.rolling(window=period).mean()
+    mad = tp.rolling(window=period).apply(lambda x: np.abs(x - x.mean()).mean())
+    return (tp - sma_tp) / (0.015 * mad)
+
+
+def synthetic_bars(length, rng):
+    """High/low/close around a random walk, with a few NaN gaps like sessions without trades."""
+    close = 1000 + np.cumsum(rng.normal(0, 5, length))
+    spread = np.abs(rng.normal(0, 3, length))
+    data = pd.DataFrame({"Max Price": close + spread, "Min Price": close - spread, "Last Price": close})
+    data.iloc[rng.choice(length, size=max(1, length // 500), replace=False), 2] = np.nan
+    return data
+
+
+def measure(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start_time)
+    return result, best
+
+
+def same_values(current, baseline):
+    current, baseline = np.asarray(current), np.asarray(baseline)
+    return np.array_equal(np.isnan(current), np.isnan(baseline)) and \
+        np.allclose(current, baseline, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compare calculate_cci with its rolling().apply predecessor.")
+    arg_parser.add_argument("--lengths", type=int, nargs="+", default=[250, 2500, 25000, 250000])
+    arg_parser.add_argument("--issuers", type=int, default=100, help="series in the batch check")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    mismatches = []
+    columns = ("Max Price", "Min Price", "Last Price")
+    print(f"{'rows':>10}{'rolling.apply s':>18}{'rolling_mad s':>16}{'speed-up':>10}")
+    for length in args.lengths:
+        data = synthetic_bars(length, rng)
+        baseline, baseline_time = measure(lambda: previous_calculate_cci(data, *columns, CCI_PERIOD), args.repeat)
+        result, current_time = measure(lambda: calculate_cci(data, *columns, CCI_PERIOD), args.repeat)
+        print(f"{length:>10}{baseline_time:>18.4f}{current_time:>16.4f}{baseline_time / current_time:>9.1f}x")
+        if not same_values(result, baseline):
+            mismatches.append(f"CCI on {length} rows")
+
+    # One call over many issuers' typical prices concatenated must equal a call per issuer.
+    series = [synthetic_bars(int(length), rng) for length in rng.integers(1, 600, args.issuers)]
+    typical = [((s["Max Price"] + s["Min Price"] + s["Last Price"]) / 3).to_numpy() for s in series]
+    offsets = np.r_[0, np.cumsum([len(tp) for tp in typical])]
+    batch, batch_time = measure(lambda: rolling_mad(np.concatenate(typical), CCI_PERIOD, offsets), args.repeat)
+    single, single_time = measure(lambda: np.concatenate([rolling_mad(tp, CCI_PERIOD) for tp in typical]),
+                                  args.repeat)
+    print(f"{args.issuers} issuers, {offsets[-1]} rows: one batched call {batch_time:.4f}s, "
+          f"a call per issuer {single_time:.4f}s")
+    if not same_values(batch, single):
+        mismatches.append("batched rolling_mad")
+
+    if mismatches:
+        print(f"MISMATCH: {', '.join(mismatches)} differ from the reference results")
+        return 1
+    print("rolling_mad agrees with rolling().apply, including NaN positions, per issuer and batched.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
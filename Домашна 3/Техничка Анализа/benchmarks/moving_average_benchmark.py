@@ -0,0 +1,87 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from Indicators.MovingAverages import calculate_hma, calculate_wma
+
+# The windows the analyzers use (WMA_30, HMA_50), plus an odd HMA window, where
+# int(window / 2) and int(sqrt(window)) both round down
+WMA_WINDOWS = (20, 30)
+HMA_WINDOWS = (20, 50, 21)
+
+
+def previous_calculate_wma(data, column, window):
+    """calculate_wma before vectorisation: a Python dot product per row through rolling().apply."""
+    weights = np.arange(1, window + 1)
+    return data[column].rolling(window).apply(
+        lambda prices: np.dot(prices, weights) / weights.sum(), raw=True
+    )
+
+
+def previous_calculate_hma(data, column, window):
+    half_window = int(window / 2)
+    sqrt_window = int(np.sqrt(window))
+
+    wma_half = previous_calculate_wma(data, column, half_window)
+    wma_full = previous_calculate_wma(data, column, window)
+    return previous_calculate_wma(data.assign(temp=2 * wma_half - wma_full), "temp", sqrt_window)
+
+
+def synthetic_prices(length, rng):
+    """A random walk with a few NaN gaps, like sessions with no last price."""
+    prices = 1000 + np.cumsum(rng.normal(0, 5, length))
+    prices[rng.choice(length, size=max(1, length // 500), replace=False)] = np.nan
+    return pd.DataFrame({"Last Price": prices})
+
+
+def measure(function, data, window, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = function(data, "Last Price", window)
+        best = min(best, time.perf_counter() - start_time)
+    return result, best
+
+
+def same_values(current, baseline):
+    current, baseline = current.to_numpy(), baseline.to_numpy()
+    return np.array_equal(np.isnan(current), np.isnan(baseline)) and \
+        np.allclose(current, baseline, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compare the vectorised WMA/HMA with their rolling().apply predecessors.")
+    arg_parser.add_argument("--lengths", type=int, nargs="+", default=[250, 2500, 25000, 250000])
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    mismatches = []
+    cases = [("WMA", previous_calculate_wma, calculate_wma, window) for window in WMA_WINDOWS] + \
+        [("HMA", previous_calculate_hma, calculate_hma, window) for window in HMA_WINDOWS]
+    print(f"{'indicator':<10}{'rows':>10}{'rolling.apply s':>18}{'vectorised s':>15}{'speed-up':>10}")
+    for length in args.lengths:
+        data = synthetic_prices(length, rng)
+        for name, previous, current, window in cases:
+            baseline, baseline_time = measure(previous, data, window, args.repeat)
+            result, current_time = measure(current, data, window, args.repeat)
+            label = f"{name}_{window}"
+            print(f"{label:<10}{length:>10}{baseline_time:>18.4f}{current_time:>15.4f}"
+                  f"{baseline_time / current_time:>9.1f}x")
+            if not same_values(result, baseline):
+                mismatches.append(f"{label} on {length} rows")
+
+    if mismatches:
+        print(f"MISMATCH: {', '.join(mismatches)} differ from the rolling().apply results")
+        return 1
+    print("Vectorised and rolling().apply results agree, including NaN positions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
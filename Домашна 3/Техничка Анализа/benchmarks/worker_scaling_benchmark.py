@@ -0,0 +1,92 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from TAnalysisPipeline import PANEL_COLUMNS, StockAnalyzer, compute_results
+from database.panel import OHLCVPanel
+
+
+def synthetic_panel(issuers, max_rows, rng):
+    """Issuers with random-walk prices over trading days, histories of very different lengths."""
+    codes, dates, lengths = [], [], []
+    for i, length in enumerate(rng.integers(20, max_rows, issuers)):
+        start = np.datetime64("2000-01-03") + int(rng.integers(0, 3000))
+        codes.append(f"I{i:04d}")
+        dates.append(np.busday_offset(start, np.arange(length), roll="forward"))
+        lengths.append(length)
+    rows = sum(lengths)
+    close = 1000 + np.cumsum(rng.normal(0, 5, rows))
+    spread = np.abs(rng.normal(0, 3, rows))
+    columns = {"last_price": close, "max_price": close + spread, "min_price": close - spread,
+               "avg_price": close, "quantity": rng.integers(0, 500, rows).astype(np.float64)}
+    columns["last_price"][rng.choice(rows, size=rows // 200, replace=False)] = np.nan
+    offsets = np.r_[0, np.cumsum(lengths)]
+    return OHLCVPanel(codes, offsets, np.concatenate(dates).astype("datetime64[D]"), columns)
+
+
+def measure(analyzer, issuers, per_issuer, workers, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        results = compute_results(analyzer, issuers, per_issuer, workers)
+        best = min(best, time.perf_counter() - start_time)
+    return results, best
+
+
+def same_results(current, baseline):
+    if list(current) != list(baseline):
+        return False
+    for issuer, timeframe_results in baseline.items():
+        if list(current[issuer]) != list(timeframe_results):
+            return False
+        for name, frames in timeframe_results.items():
+            for part in ("indicators", "signals"):
+                try:
+                    pd.testing.assert_frame_equal(current[issuer][name][part], frames[part], check_exact=True,
+                                                  check_freq=False)
+                except AssertionError:
+                    return False
+    return True
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Time compute_results on 1, 2, 4 and 8 worker processes.")
+    arg_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    arg_parser.add_argument("--issuers", type=int, default=400)
+    arg_parser.add_argument("--max-rows", type=int, default=5000, help="longest issuer history, in trading days")
+    arg_parser.add_argument("--per-issuer", action="store_true", help="analyze issuers one at a time in each worker")
+    arg_parser.add_argument("--repeat", type=int, default=1)
+    args = arg_parser.parse_args()
+
+    panel = synthetic_panel(args.issuers, args.max_rows, np.random.default_rng(0))
+    analyzer = StockAnalyzer(panel=panel)
+    issuers = list(panel.issuers)
+    print(f"{len(issuers)} issuers, {panel.rows} rows, {os.cpu_count()} cores available, "
+          f"{'per-issuer' if args.per_issuer else 'segmented'} analysis")
+
+    baseline = None
+    mismatches = []
+    print(f"{'workers':>8}{'seconds':>10}{'speed-up':>10}{'efficiency':>12}")
+    for workers in args.workers:
+        results, seconds = measure(analyzer, issuers, args.per_issuer, workers, args.repeat)
+        if baseline is None:
+            baseline, baseline_seconds = results, seconds
+        elif not same_results(results, baseline):
+            mismatches.append(workers)
+        speed_up = baseline_seconds / seconds
+        print(f"{workers:>8}{seconds:>10.2f}{speed_up:>9.2f}x{100 * speed_up / workers:>11.0f}%")
+
+    if mismatches:
+        print(f"MISMATCH: results with {', '.join(map(str, mismatches))} workers differ from the first run")
+        return 1
+    print("Every worker count gives the same indicators and signals.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,35 +1,48 @@
-import sqlite3
 import pandas as pd
 import os
 import subprocess
 import sys
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../Домашна 1"))
+from database.columnar import open_history
+from database.storage import get_storage
+
+HISTORY_COLUMNS = ['percent_change', 'quantity', 'total_turnover']
+
 #Base
 class FundamentalAnalyzer:
-    def __init__(self, db_path):
+    def __init__(self, db_path, panel=None):
+        # History comes from the in-memory panel when one is given; news is always read from db_path
         self.db_path = db_path
+        self.panel = panel
+        self.storage = get_storage(db_path)
         self.analyzer = SentimentIntensityAnalyzer()
+        self.news = None
 #Hist data
     def get_historical_data(self, issuer_code):
         try:
-            conn = sqlite3.connect(self.db_path)
+            if self.panel is not None:
+                if issuer_code not in self.panel:
+                    return None
+                data = self.panel.frame(issuer_code, {column: column for column in HISTORY_COLUMNS})
+                data.dropna(subset=HISTORY_COLUMNS, inplace=True)
+                return data
+
             query = """
             SELECT date, percent_change, quantity, total_turnover
             FROM historical_data
             WHERE issuer_code = ?
             ORDER BY date ASC
             """
-            data = pd.read_sql_query(query, conn, params=(issuer_code,))
-            conn.close()
+            data = self.storage.read_frame(query, params=(issuer_code,))
 
             # Convert 'date' to datetime format
             data['date'] = pd.to_datetime(data['date'], errors='coerce')
 
-            # Handle invalid or missing numerical data by setting them as NaN
-            data['percent_change'] = pd.to_numeric(data['percent_change'], errors='coerce')
-            data['quantity'] = pd.to_numeric(data['quantity'], errors='coerce')
-            data['total_turnover'] = pd.to_numeric(data['total_turnover'], errors='coerce')
+            # Numeric columns are stored typed; missing values load as NaN
+            data[['percent_change', 'quantity', 'total_turnover']] = \
+                data[['percent_change', 'quantity', 'total_turnover']].astype('float64')
 
             # Drop rows with NaN values in critical columns
             data.dropna(subset=['percent_change', 'quantity', 'total_turnover'], inplace=True)
@@ -41,27 +54,37 @@ class FundamentalAnalyzer:
             return None
 # Get issuers
     def get_all_issuers(self):
+        if self.panel is not None:
+            return list(self.panel.issuers)
 
         try:
-            conn = sqlite3.connect(self.db_path)
             query = "SELECT DISTINCT issuer_code FROM historical_data"
-            issuers = pd.read_sql_query(query, conn)
-            conn.close()
+            issuers = self.storage.read_frame(query)
             return issuers['issuer_code'].tolist()
         except Exception as e:
             print(f"Error fetching issuers: {str(e)}")
             return []
+# Load news for every company in one query
+    def load_company_news(self):
+        try:
+            query = "SELECT company_name, title, news_text, sentiment FROM company_news"
+            news_data = self.storage.read_frame(query)
+            self.news = {company: group.drop(columns='company_name').reset_index(drop=True)
+                         for company, group in news_data.groupby('company_name')}
+        except Exception as e:
+            print(f"Error fetching company news: {str(e)}")
+            self.news = None
 # Get company news
     def get_company_news(self, issuer_code):
+        if self.news is not None:
+            return self.news.get(issuer_code, pd.DataFrame(columns=['title', 'news_text', 'sentiment']))
         try:
-            conn = sqlite3.connect(self.db_path)
             query = """
             SELECT title, news_text, sentiment
             FROM company_news
             WHERE company_name = ?
             """
-            news_data = pd.read_sql_query(query, conn, params=(issuer_code,))
-            conn.close()
+            news_data = self.storage.read_frame(query, params=(issuer_code,))
             return news_data  # This returns a DataFrame
         except Exception as e:
             print(f"Error fetching company news for {issuer_code}: {str(e)}")
@@ -179,12 +202,14 @@ class FundamentalAnalyzer:
 
 def main():
     db_path = r'E:\Predmeti Faks\Das_Project\Project_DAS\Домашна 1\database\macedonian_stock_exchange.db'
-    analyzer = FundamentalAnalyzer(db_path)
+    # Memory-mapped columnar store when current, else one ordered pass over historical_data
+    analyzer = FundamentalAnalyzer(db_path, panel=open_history(db_path))
 
     # Run Fetch_news.py to update company news data
     if not analyzer.run_fetch_news():
         print("Failed to update company news. Exiting.")
         return
+    analyzer.load_company_news()
 
     # Get all issuers from the database
     issuers = analyzer.get_all_issuers()
@@ -1,14 +1,26 @@
+import os
+import sys
 import requests
 from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
 from textblob import TextBlob
-import sqlite3
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../Домашна 1"))
+from filters.http_cache import PageCache
+from database.storage import get_storage
 
 # Define the database path change*
 DB_PATH = '../../Домашна 1/database/macedonian_stock_exchange.db'
 
 # Fetch news function
 def fetch_news():
+    # One page cache and one list of issuers for the whole run, shared by every article
+    companies = load_companies()
+    with PageCache() as cache:
+        return fetch_news_pages(cache, companies)
+
+
+def fetch_news_pages(cache, companies):
 
     url_base = 'https://www.mse.mk/en/news/latest/'
 
@@ -58,13 +70,13 @@ def fetch_news():
                 # Fetch the detailed news page to get the full body
                 detailed_news_url = item.find('a', href=True)['href']
                 if detailed_news_url:
-                    full_body = fetch_full_body(detailed_news_url)
+                    full_body = fetch_full_body(detailed_news_url, cache)
 
                     # Perform sentiment analysis
                     sentiment = analyze_sentiment(full_body)
 
                     # Check if the news article matches a company
-                    matching_companies = check_company_in_news(full_body, headline)
+                    matching_companies = check_company_in_news(full_body, headline, companies)
 
                     # Save the article to the list
                     for company in matching_companies:
@@ -82,26 +94,33 @@ def fetch_news():
     return news_articles
 
 # Fetch body of article
-def fetch_full_body(news_url):
+def fetch_full_body(news_url, cache):
     base_url = 'https://www.mse.mk'
 
     # Ensure the URL is absolute
     if not news_url.startswith('http'):
         news_url = base_url + news_url
 
-    response = requests.get(news_url)
-    if response.status_code == 200:
-        soup = BeautifulSoup(response.content, 'html.parser')
-        # Extract the body text from the panel
-        body_tag = soup.find('div', class_='panel-body')
-        if body_tag:
-            paragraphs = body_tag.find_all('p')
-            full_body = ' '.join([p.text.strip() for p in paragraphs])
-            return full_body
-        else:
-            return "No body content found."
+    # Published articles do not change, so a cached copy never expires
+    cached = cache.get(news_url)
+    if cached:
+        content = cached[0]
     else:
-        return "Failed to retrieve detailed news."
+        response = requests.get(news_url)
+        if response.status_code != 200:
+            return "Failed to retrieve detailed news."
+        content = response.content
+        cache.put(news_url, None, content)
+
+    soup = BeautifulSoup(content, 'html.parser')
+    # Extract the body text from the panel
+    body_tag = soup.find('div', class_='panel-body')
+    if body_tag:
+        paragraphs = body_tag.find_all('p')
+        full_body = ' '.join([p.text.strip() for p in paragraphs])
+        return full_body
+    else:
+        return "No body content found."
 
 
 def analyze_sentiment(text):
@@ -119,19 +138,20 @@ def analyze_sentiment(text):
     return sentiment
 
 
-def check_company_in_news(news_body, headline):
-    """Check if any company name appears in the news body or headline."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+def load_companies():
+    """All unique issuer codes, each paired with its lowercase form for matching."""
+    rows = get_storage(DB_PATH).query("SELECT DISTINCT issuer_code FROM historical_data")
+    return [(row[0], row[0].lower()) for row in rows]
 
-    # Fetch all unique issuer names (or any other relevant information from your database)
-    cursor.execute("SELECT DISTINCT issuer_code FROM historical_data")
-    companies = [row[0] for row in cursor.fetchall()]
-    conn.close()
+
+def check_company_in_news(news_body, headline, companies):
+    """Check if any company name appears in the news body or headline."""
+    news_body = news_body.lower()
+    headline = headline.lower()
 
     matching_companies = []
-    for company in companies:
-        if company.lower() in news_body.lower() or company.lower() in headline.lower():
+    for company, name in companies:
+        if name in news_body or name in headline:
             matching_companies.append(company)
 
     return matching_companies
@@ -139,35 +159,30 @@ def check_company_in_news(news_body, headline):
 
 def save_news_to_db(news_articles):
     """Save news articles into the company_news table."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    # Create the company_news table if it doesn't exist
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS company_news (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            company_name TEXT NOT NULL,
-            title TEXT NOT NULL,
-            news_text TEXT NOT NULL,
-            sentiment TEXT NOT NULL,
-            date_fetched TEXT NOT NULL
-        )
-    ''')
-
-    # Insert each news article into the table
-    for article in news_articles:
-        # Convert datetime to string format to avoid deprecation warning
-        date_str = article['date'].strftime('%Y-%m-%d %H:%M:%S')  # Format the date to a string
-
-        # Insert data into the correct columns
-        cursor.execute('''
-            INSERT INTO company_news (company_name, title, news_text, sentiment, date_fetched) 
-            VALUES (?, ?, ?, ?, ?)
-        ''', (article['company'], article['headline'], article['body'], article['sentiment'], date_str))
-
-    # Commit the changes and close the connection
-    conn.commit()
-    conn.close()
+    storage = get_storage(DB_PATH)
+    with storage.transaction():
+        # Create the company_news table if it doesn't exist
+        storage.execute('''
+            CREATE TABLE IF NOT EXISTS company_news (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                company_name TEXT NOT NULL,
+                title TEXT NOT NULL,
+                news_text TEXT NOT NULL,
+                sentiment TEXT NOT NULL,
+                date_fetched TEXT NOT NULL
+            )
+        ''')
+
+        # Insert each news article into the table
+        for article in news_articles:
+            # Convert datetime to string format to avoid deprecation warning
+            date_str = article['date'].strftime('%Y-%m-%d %H:%M:%S')  # Format the date to a string
+
+            # Insert data into the correct columns
+            storage.execute('''
+                INSERT INTO company_news (company_name, title, news_text, sentiment, date_fetched) 
+                VALUES (?, ?, ?, ?, ?)
+            ''', (article['company'], article['headline'], article['body'], article['sentiment'], date_str))
 
 
 def main():
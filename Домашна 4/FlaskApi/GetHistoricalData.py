@@ -1,10 +1,13 @@
 from flask import Flask, jsonify, request
 import os
+import sys
 import requests
-from bs4 import BeautifulSoup
-from datetime import datetime, timedelta
-import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../Домашна 1"))
+from filters.fetch_engine import fetch_all
+from filters.http_cache import PageCache
+from database.typed_storage import newest_first_key
 
 app = Flask(__name__)
 
@@ -23,58 +26,6 @@ def fetch_issuer_codes():
         return []
 
 
-def get_date_ranges(start_date, end_date, days_per_chunk=340):
-    if isinstance(start_date, str):
-        start_date = datetime.strptime(start_date, "%m-%d-%Y")
-    if isinstance(end_date, str):
-        end_date = datetime.strptime(end_date, "%m-%d-%Y")
-    date_ranges = []
-    current_start = start_date
-    while current_start <= end_date:
-        current_end = min(current_start + timedelta(days=days_per_chunk - 1), end_date)
-        date_ranges.append((current_start.strftime("%m-%d-%Y"), current_end.strftime("%m-%d-%Y")))
-        current_start = current_end + timedelta(days=1)
-    return date_ranges
-
-
-def fetch_and_parse_issuer_data(issuer_code, start_date, end_date):
-    base_url = f"https://www.mse.mk/en/stats/symbolhistory/{issuer_code}"
-    date_ranges = get_date_ranges(start_date, end_date)
-    issuer_data = []
-    headers = {"User-Agent": "Mozilla/5.0"}
-    for start_date_range, end_date_range in date_ranges:
-        response = requests.get(base_url,
-                                params={"FromDate": start_date_range.replace("-", "/"),
-                                        "ToDate": end_date_range.replace("-", "/")},
-                                headers=headers)
-        if response.status_code == 200:
-            parsed_data = parse_data_from_html(response.text, issuer_code)
-            issuer_data.extend(parsed_data)
-    return issuer_data
-
-
-def parse_data_from_html(html_content, issuer_code):
-    soup = BeautifulSoup(html_content, "html.parser")
-    table = soup.find("table", id="resultsTable")
-    data = []
-    if table:
-        rows = table.find_all("tr")
-        for row in rows[1:]:
-            columns = row.find_all("td")
-            if len(columns) == 9:
-                data.append((issuer_code,
-                             columns[0].text.strip(),
-                             columns[1].text.strip().replace(",", ""),
-                             columns[2].text.strip().replace(",", ""),
-                             columns[3].text.strip().replace(",", ""),
-                             columns[4].text.strip().replace(",", ""),
-                             columns[5].text.strip(),
-                             columns[6].text.strip().replace(",", ""),
-                             columns[7].text.strip().replace(",", ""),
-                             columns[8].text.strip().replace(",", "")))
-    return data
-
-
 def send_data_to_spring_api(data):
     try:
         formatted_data = [
@@ -121,22 +72,13 @@ def fetch_and_store_data():
     if not issuers:
         return jsonify({"error": "No issuers found."}), 400
 
-    chunk_size = 100
-    total_issuers = len(issuers)
-
-    with ThreadPoolExecutor(max_workers=100) as executor:
-        futures = []
-        for i in range(0, total_issuers, chunk_size):
-            chunk = issuers[i:i + chunk_size]
-            for issuer in chunk:
-                issuer_code = issuer["code"]
-                futures.append(executor.submit(fetch_and_parse_issuer_data, issuer_code, start_date_str, end_date_str))
-
-        all_data = []
-        for future in as_completed(futures):
-            all_data.extend(future.result())
+    jobs = [(issuer["code"], start_date_str, end_date_str) for issuer in issuers]
+    all_data = []
+    with PageCache() as cache:
+        for issuer_data in fetch_all(jobs, cache=cache).values():
+            all_data.extend(issuer_data)
 
-    sorted_data = sorted(all_data, key=lambda x: (x[0], -datetime.strptime(x[1], "%m/%d/%Y").timestamp()))
+    sorted_data = sorted(all_data, key=newest_first_key)
 
     send_data_to_spring_api(sorted_data)
 
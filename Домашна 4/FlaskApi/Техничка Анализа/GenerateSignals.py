@@ -1,4 +1,6 @@
 from flask import Flask, jsonify, request
+import os
+import sys
 import requests
 import pandas as pd
 import numpy as np
@@ -7,10 +9,42 @@ from typing import Dict, List, Optional, Tuple
 import concurrent.futures
 from collections import defaultdict
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../Домашна 1"))
+from database.bars import open_bars
+from database.columnar import ColumnarStore
+from database.result_cache import ResultCache, version_tag
+from database.typed_storage import decode_numbers
+from Indicators import Engine
+
 app = Flask(__name__)
 
 HISTORICAL_DATA_API_URL = "http://localhost:8080/api/historicaldata"
 SIGNALS_API_URL = "http://localhost:8080/api/signals/add"
+CURRENCY_SYMBOLS = '$£€¥'
+# Pandas rules of the weekly and monthly bars, as database/bars.py stores them
+RESAMPLE_RULES = {'W': 'W', 'M': 'ME'}
+STORE_COLUMNS = {
+    'last_price': 'Last Price',
+    'max_price': 'Max Price',
+    'min_price': 'Min Price',
+    'avg_price': 'Avg Price',
+    'quantity': 'Quantity'
+}
+
+LAST, HIGH, LOW = Engine.column('Last Price'), Engine.column('Max Price'), Engine.column('Min Price')
+SIGNAL_INDICATORS = {
+    'SMA_20': Engine.sma(LAST, 20),
+    'EMA_10': Engine.ema(LAST, 10),
+    'MACD': Engine.macd(LAST),
+    'RSI': Engine.rsi(LAST),
+    'STOCH_K': Engine.stochastic_k(HIGH, LOW, LAST),
+    'STOCH_D': Engine.stochastic_d(HIGH, LOW, LAST),
+    'Volume_SMA_20': Engine.sma(Engine.column('Quantity'), 20),
+    'Price_Change': Engine.price_change(LAST),
+    'ATR': Engine.atr(HIGH, LOW, LAST),
+}
+SIGNAL_SET_VERSION = version_tag('signals-v1', SIGNAL_INDICATORS)
+NO_SIGNALS_ERROR = "Failed to generate any valid signals"
 
 
 class StockAnalyzer:
@@ -20,32 +54,7 @@ class StockAnalyzer:
             'Weekly': 'W',
             'Monthly': 'M'
         }
-
-    def calculate_sma(self, data: pd.Series, period: int) -> pd.Series:
-        return data.rolling(window=period).mean()
-
-    def calculate_ema(self, data: pd.Series, period: int) -> pd.Series:
-        return data.ewm(span=period, adjust=False).mean()
-
-    def calculate_macd(self, data: pd.Series) -> pd.Series:
-        exp1 = data.ewm(span=12, adjust=False).mean()
-        exp2 = data.ewm(span=26, adjust=False).mean()
-        return exp1 - exp2
-
-    def calculate_rsi(self, data: pd.Series, period: int = 14) -> pd.Series:
-        delta = data.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        return 100 - (100 / (1 + rs))
-
-    def calculate_stochastic(self, high: pd.Series, low: pd.Series, close: pd.Series,
-                             k_period: int = 14, d_period: int = 3) -> Tuple[pd.Series, pd.Series]:
-        lowest_low = low.rolling(window=k_period).min()
-        highest_high = high.rolling(window=k_period).max()
-        k = 100 * (close - lowest_low) / (highest_high - lowest_low)
-        d = k.rolling(window=d_period).mean()
-        return k, d
+        self.engine = Engine.IndicatorEngine(SIGNAL_INDICATORS)
 
     def resample_data(self, df: pd.DataFrame, timeframe: str) -> pd.DataFrame:
         if timeframe not in ['D', 'W', 'M']:
@@ -56,7 +65,7 @@ class StockAnalyzer:
                 df[col] = pd.to_numeric(df[col], errors='coerce')
         if timeframe == 'D':
             return df.set_index('date').sort_index()
-        return df.resample(timeframe, on='date').agg({
+        return df.resample(RESAMPLE_RULES[timeframe], on='date').agg({
             'Last Price': 'last',
             'Max Price': 'max',
             'Min Price': 'min',
@@ -64,31 +73,73 @@ class StockAnalyzer:
             'Quantity': 'sum'
         }).dropna()
 
-    def calculate_atr(self, df: pd.DataFrame, period: int = 14) -> pd.Series:
-        high = df['Max Price']
-        low = df['Min Price']
-        close = df['Last Price']
-        tr1 = high - low
-        tr2 = abs(high - close.shift())
-        tr3 = abs(low - close.shift())
-        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        return tr.rolling(window=period).mean()
-
-    def calculate_all_indicators(self, df: pd.DataFrame, timeframe: str = 'D') -> pd.DataFrame:
-        df = self.resample_data(df, timeframe)
-        df['SMA_20'] = self.calculate_sma(df['Last Price'], 20)
-        df['EMA_10'] = self.calculate_ema(df['Last Price'], 10)
-        df['MACD'] = self.calculate_macd(df['Last Price'])
-        df['RSI'] = self.calculate_rsi(df['Last Price'])
-        df['STOCH_K'], df['STOCH_D'] = self.calculate_stochastic(
-            df['Max Price'], df['Min Price'], df['Last Price']
-        )
-        df['Volume_SMA_20'] = self.calculate_sma(df['Quantity'], 20)
-        df['Price_Change'] = df['Last Price'].pct_change()
-        df['ATR'] = self.calculate_atr(df)
-        return df
+    def calculate_all_indicators(self, df: pd.DataFrame, timeframe: str = 'D',
+                                 bars: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        # bars: the issuer's stored weekly or monthly bars, used instead of resampling df
+        if bars is None:
+            bars = self.resample_data(df, timeframe)
+        return self.engine.apply(bars)
+
+    def calculate_panel_indicators(self, frames: List[pd.DataFrame], timeframe: str = 'D',
+                                   bars: Optional[List[Optional[pd.DataFrame]]] = None
+                                   ) -> Tuple[pd.DataFrame, np.ndarray]:
+        """calculate_all_indicators for many issuers in one segmented pass.
+
+        bars optionally holds each issuer's stored weekly or monthly bars, None
+        where its frame still has to be resampled. Returns one frame with the
+        issuers' bars back to back, in the order of frames, and the offsets
+        delimiting each issuer's rows.
+        """
+        if timeframe not in ['D', 'W', 'M']:
+            raise ValueError(f"Invalid timeframe: {timeframe}")
+        if timeframe == 'D' or bars is None or all(bar is None for bar in bars):
+            df, offsets = self.panel_bars(frames, timeframe)
+        else:
+            bars = list(bars)
+            resampled = [i for i, bar in enumerate(bars) if bar is None]
+            if resampled:
+                df, offsets = self.panel_bars([frames[i] for i in resampled], timeframe)
+                for j, i in enumerate(resampled):
+                    bars[i] = df.iloc[offsets[j]:offsets[j + 1]]
+            offsets = np.r_[0, np.cumsum([len(bar) for bar in bars])]
+            df = pd.concat(bars)
+        return self.engine.apply(df, offsets), offsets
+
+    def panel_bars(self, frames: List[pd.DataFrame], timeframe: str) -> Tuple[pd.DataFrame, np.ndarray]:
+        # The frames' rows, or their weekly/monthly bars resampled with a single groupby, and their offsets
+        df = pd.concat(frames, ignore_index=True)
+        df['issuer'] = np.repeat(np.arange(len(frames)), [len(frame) for frame in frames])
+        for col in ['Last Price', 'Max Price', 'Min Price', 'Avg Price', 'Quantity']:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+        if timeframe == 'D':
+            df = df.sort_values(['issuer', 'date'], kind='stable').set_index('date')
+            issuers = df.pop('issuer')
+        else:
+            df = df.groupby(['issuer', pd.Grouper(key='date', freq=RESAMPLE_RULES[timeframe])]).agg({
+                'Last Price': 'last',
+                'Max Price': 'max',
+                'Min Price': 'min',
+                'Avg Price': 'mean',
+                'Quantity': 'sum'
+            }).dropna()
+            issuers = df.index.get_level_values('issuer')
+            df = df.droplevel('issuer')
+        offsets = np.r_[0, np.cumsum(np.bincount(issuers, minlength=len(frames)))]
+        return df, offsets
 
     def generate_signals(self, df: pd.DataFrame) -> pd.DataFrame:
+        signals = self.label_signals(df)
+        return signals.dropna(subset=['signal'])
+
+    def generate_panel_signals(self, df: pd.DataFrame, offsets: np.ndarray) -> Tuple[pd.DataFrame, np.ndarray]:
+        """generate_signals over a calculate_panel_indicators frame, with the offsets of the kept rows."""
+        signals = self.label_signals(df)
+        kept = signals['signal'].notna().to_numpy()
+        kept_before = np.r_[0, np.cumsum(kept)]
+        return signals[kept], kept_before[offsets]
+
+    def label_signals(self, df: pd.DataFrame) -> pd.DataFrame:
         signals = pd.DataFrame(index=df.index)
         signals['date'] = df.index
         signals['price'] = df['Last Price']
@@ -119,8 +170,6 @@ class StockAnalyzer:
         signals.loc[buy_conditions, 'signal'] = 'BUY'
         signals.loc[sell_conditions, 'signal'] = 'SELL'
 
-        signals = signals.dropna(subset=['signal'])
-
         return signals
 
     def send_signals_to_spring(self, signals: pd.DataFrame, issuer_code: str, timeframe: str) -> bool:
@@ -157,11 +206,15 @@ class StockAnalyzer:
 
 
 class BatchStockAnalyzer:
-    def __init__(self):
+    def __init__(self, cache: Optional[ResultCache] = None):
         self.analyzer = StockAnalyzer()
+        self.cache = cache
+        # Weekly and monthly bars stored by the ingestion pipeline (database/bars.py), when current with the store
+        self.bars = None
+        # Issuers whose signals Spring did not accept; their results are not cached so the next run resends them
+        self.unsaved = set()
 
     def preprocess_data(self, df: pd.DataFrame) -> pd.DataFrame:
-        numeric_columns = ['lastPrice', 'maxPrice', 'minPrice', 'avgPrice', 'quantity']
         renamed_columns = {
             'lastPrice': 'Last Price',
             'maxPrice': 'Max Price',
@@ -169,26 +222,46 @@ class BatchStockAnalyzer:
             'avgPrice': 'Avg Price',
             'quantity': 'Quantity'
         }
-        df = df.copy()
         df = df.rename(columns=renamed_columns)
-        for col in numeric_columns:
-            mapped_col = renamed_columns[col]
-            if col in df.columns:
+        for col, mapped_col in renamed_columns.items():
+            if mapped_col in df.columns and not pd.api.types.is_numeric_dtype(df[mapped_col]):
                 try:
-                    if df[col].dtype == object:
-                        cleaned = df[col].astype(str).apply(lambda x: x.strip('$£€¥').replace(',', '').strip())
-                        cleaned = cleaned.apply(lambda x: str(float(x) / 100) if x.endswith('%') else x)
-                        df[mapped_col] = pd.to_numeric(cleaned, errors='coerce')
-                        df[mapped_col] = df[mapped_col].fillna(method='ffill').fillna(method='bfill')
-                        print(f"Successfully processed {col} -> {mapped_col}")
-                        print(f"Sample values: {df[mapped_col].head()}")
-                        print(f"Data type: {df[mapped_col].dtype}")
+                    df[mapped_col] = pd.Series(self.decode_prices(df[mapped_col]), index=df.index).ffill().bfill()
+                    print(f"Successfully processed {col} -> {mapped_col}")
+                    print(f"Sample values: {df[mapped_col].head()}")
+                    print(f"Data type: {df[mapped_col].dtype}")
                 except Exception as e:
                     print(f"Error processing {col}: {str(e)}")
                     df[mapped_col] = np.nan
         return df
 
+    def decode_prices(self, values: pd.Series) -> np.ndarray:
+        # Spring serves prices as "21,600.00"; currency signs and percentages are the exception,
+        # so the per-value cleanup only runs when the column holds one.
+        text = values.astype('string')
+        if not any(symbol in ''.join(text.dropna()) for symbol in CURRENCY_SYMBOLS + '%'):
+            return decode_numbers(text, decimal='.', thousands=',')
+        text = text.str.strip().str.strip(CURRENCY_SYMBOLS).str.strip()
+        percent = text.str.endswith('%').fillna(False).to_numpy(dtype=bool)
+        numbers = decode_numbers(text.str.rstrip('%'), decimal='.', thousands=',')
+        numbers[percent] /= 100
+        return numbers
+
+    def get_store_historical_data(self, store: ColumnarStore) -> Dict[str, pd.DataFrame]:
+        grouped_data = {}
+        for issuer_code in store.issuers:
+            data = store.frame(issuer_code, STORE_COLUMNS)
+            data = data.dropna(subset=list(STORE_COLUMNS.values()), how='all')
+            if len(data) >= 20:
+                grouped_data[issuer_code] = data
+        return grouped_data
+
     def get_all_historical_data(self) -> Dict[str, pd.DataFrame]:
+        # The ingestion pipeline's memory-mapped store needs no JSON download or string cleaning
+        store = ColumnarStore.open()
+        if store is not None:
+            self.bars = open_bars(synced_id=store.index['synced_id'])
+            return self.get_store_historical_data(store)
         try:
             response = requests.get(HISTORICAL_DATA_API_URL)
             if response.status_code != 200:
@@ -214,43 +287,119 @@ class BatchStockAnalyzer:
             print(f"Error in get_all_historical_data: {str(e)}")
             return {}
 
+    def _prepare_issuer_data(self, data: pd.DataFrame) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+        required_columns = ['Last Price', 'Max Price', 'Min Price', 'Avg Price', 'Quantity']
+        if not all(col in data.columns for col in required_columns):
+            return None, "Missing required columns"
+        if data[required_columns].isna().any().any():
+            data[required_columns] = data[required_columns].interpolate(method='linear')
+        if len(data) < 20:
+            return None, "Insufficient data points"
+        return data, None
+
+    def _issuer_bars(self, issuer_code: str, timeframe: str) -> Optional[pd.DataFrame]:
+        # Stored bars count a missing value as 0 where _prepare_issuer_data interpolates it,
+        # so they stand in for resampling only for issuers with no gaps.
+        if self.bars is None or timeframe not in self.bars or issuer_code not in self.bars[timeframe]:
+            return None
+        bars = self.bars[timeframe].frame(issuer_code, dict(STORE_COLUMNS, missing='missing'))
+        if bars['missing'].any():
+            return None
+        return bars.drop(columns='missing').set_index('date')
+
+    def _timeframe_result(self, issuer_code: str, name: str, signals: pd.DataFrame) -> Optional[Dict]:
+        if signals.empty:
+            return None
+        if not self.analyzer.send_signals_to_spring(signals, issuer_code, name):
+            print(f"Failed to save signals for {issuer_code} - {name}")
+            self.unsaved.add(issuer_code)
+            return None
+        return {
+            "last_signal": signals.iloc[-1].to_dict(),
+            "signal_count": len(signals),
+            "date_range": {
+                "start": signals.index[0].strftime('%Y-%m-%d'),
+                "end": signals.index[-1].strftime('%Y-%m-%d')
+            }
+        }
+
+    def _issuer_result(self, timeframe_results: Dict) -> Dict:
+        if not timeframe_results:
+            return {"error": NO_SIGNALS_ERROR}
+        return {
+            "data": timeframe_results,
+            "signal_count": sum(result["signal_count"] for result in timeframe_results.values())
+        }
+
+    def _watermark(self, data: pd.DataFrame) -> Tuple[str, int]:
+        return data['date'].max().strftime('%Y-%m-%d'), len(data)
+
+    def _split_cached(self, grouped_data: Dict[str, pd.DataFrame]) -> Tuple[Dict, Dict[str, pd.DataFrame]]:
+        """Results of issuers with no new rows since they were cached, and the data of the rest.
+
+        A cached issuer's signals were already sent to Spring, so it is neither recomputed nor reposted.
+        """
+        if self.cache is None:
+            return {}, grouped_data
+        cached, stale = {}, {}
+        for issuer_code, data in grouped_data.items():
+            last_date, rows = self._watermark(data)
+            timeframe_results = {}
+            for name in self.analyzer.timeframes:
+                result = self.cache.get(issuer_code, name, SIGNAL_SET_VERSION, last_date, rows)
+                if result is None:
+                    break
+                timeframe_results[name] = result
+            if len(timeframe_results) == len(self.analyzer.timeframes):
+                cached[issuer_code] = self._issuer_result(
+                    {name: result for name, result in timeframe_results.items() if result})
+            else:
+                stale[issuer_code] = data
+        return cached, stale
+
+    def _cache_results(self, grouped_data: Dict[str, pd.DataFrame], results: Dict) -> None:
+        # Failed analyses and unsent signals are left out, so they are retried on the next run
+        if self.cache is None:
+            return
+        for issuer_code, data in grouped_data.items():
+            result = results.get(issuer_code, {})
+            if issuer_code in self.unsaved or ("data" not in result and result.get("error") != NO_SIGNALS_ERROR):
+                continue
+            last_date, rows = self._watermark(data)
+            for name in self.analyzer.timeframes:
+                self.cache.put(issuer_code, name, SIGNAL_SET_VERSION, last_date, rows,
+                               result.get("data", {}).get(name, {}))
+        print(f"Result cache: {self.cache.summary()}")
+
     def _analyze_single_issuer(self, issuer_code: str, data: pd.DataFrame) -> Dict:
         try:
-            required_columns = ['Last Price', 'Max Price', 'Min Price', 'Avg Price', 'Quantity']
-            if not all(col in data.columns for col in required_columns):
-                return {"error": "Missing required columns"}
-            if data[required_columns].isna().any().any():
-                data[required_columns] = data[required_columns].interpolate(method='linear')
-            if len(data) < 20:
-                return {"error": "Insufficient data points"}
+            data, error = self._prepare_issuer_data(data)
+            if error:
+                return {"error": error}
             timeframe_results = {}
-            signal_count = 0
             for name, timeframe in self.analyzer.timeframes.items():
                 try:
-                    df_indicators = self.analyzer.calculate_all_indicators(data.copy(), timeframe)
+                    df_indicators = self.analyzer.calculate_all_indicators(
+                        data.copy(), timeframe, self._issuer_bars(issuer_code, timeframe))
                     signals = self.analyzer.generate_signals(df_indicators)
-                    if not signals.empty:
-                        if not self.analyzer.send_signals_to_spring(signals, issuer_code, name):
-                            print(f"Failed to save signals for {issuer_code} - {name}")
-                            continue
-                        signal_count += len(signals)
-                        timeframe_results[name] = {
-                            "last_signal": signals.iloc[-1].to_dict(),
-                            "signal_count": len(signals),
-                            "date_range": {
-                                "start": signals.index[0].strftime('%Y-%m-%d'),
-                                "end": signals.index[-1].strftime('%Y-%m-%d')
-                            }
-                        }
+                    result = self._timeframe_result(issuer_code, name, signals)
+                    if result:
+                        timeframe_results[name] = result
                 except Exception as e:
                     print(f"Error analyzing {issuer_code} for {name}: {str(e)}")
                     continue
-            if not timeframe_results:
-                return {"error": "Failed to generate any valid signals"}
-            return {
-                "data": timeframe_results,
-                "signal_count": signal_count
-            }
+            return self._issuer_result(timeframe_results)
+        except Exception as e:
+            return {"error": f"Analysis failed: {str(e)}"}
+
+    def _report_issuer(self, issuer_code: str, signals_by_timeframe: Dict[str, pd.DataFrame]) -> Dict:
+        try:
+            timeframe_results = {}
+            for name, signals in signals_by_timeframe.items():
+                result = self._timeframe_result(issuer_code, name, signals)
+                if result:
+                    timeframe_results[name] = result
+            return self._issuer_result(timeframe_results)
         except Exception as e:
             return {"error": f"Analysis failed: {str(e)}"}
 
@@ -259,7 +408,8 @@ class BatchStockAnalyzer:
             grouped_data = self.get_all_historical_data()
             if not grouped_data:
                 return {"error": "No data available for analysis"}
-            results = defaultdict(dict)
+            cached, grouped_data = self._split_cached(grouped_data)
+            results = defaultdict(dict, cached)
             with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
                 future_to_issuer = {
                     executor.submit(self._analyze_single_issuer, issuer_code, data): issuer_code
@@ -273,18 +423,87 @@ class BatchStockAnalyzer:
                     except Exception as e:
                         print(f"Error analyzing issuer {issuer_code}: {str(e)}")
                         results[issuer_code] = {"error": f"Failed to analyze issuer {issuer_code}"}
+            print(f"Indicator engine: {self.analyzer.engine.stats.summary()}")
+            self._cache_results(grouped_data, results)
             return results
         except Exception as e:
             print(f"Error during batch analysis: {str(e)}")
             return {"error": f"Batch analysis failed: {str(e)}"}
 
 
+    def analyze_panel(self, max_workers: int = 4) -> Dict:
+        """analyze_batch with every issuer's indicators and signals computed in one pass per timeframe.
+
+        Only sending the signals to Spring runs per issuer, on max_workers threads.
+        """
+        try:
+            grouped_data = self.get_all_historical_data()
+            if not grouped_data:
+                return {"error": "No data available for analysis"}
+            cached, grouped_data = self._split_cached(grouped_data)
+            results = defaultdict(dict, cached)
+            prepared = {}
+            for issuer_code, data in grouped_data.items():
+                try:
+                    data, error = self._prepare_issuer_data(data)
+                except Exception as e:
+                    data, error = None, f"Analysis failed: {str(e)}"
+                if error:
+                    results[issuer_code] = {"error": error}
+                else:
+                    prepared[issuer_code] = data
+
+            signals_by_issuer = defaultdict(dict)
+            for name, timeframe in self.analyzer.timeframes.items():
+                if not prepared:
+                    break
+                try:
+                    df_indicators, offsets = self.analyzer.calculate_panel_indicators(
+                        list(prepared.values()), timeframe,
+                        [self._issuer_bars(issuer_code, timeframe) for issuer_code in prepared])
+                    signals, offsets = self.analyzer.generate_panel_signals(df_indicators, offsets)
+                except Exception as e:
+                    print(f"Error analyzing all issuers for {name}: {str(e)}")
+                    continue
+                for i, issuer_code in enumerate(prepared):
+                    signals_by_issuer[issuer_code][name] = signals.iloc[offsets[i]:offsets[i + 1]]
+
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                future_to_issuer = {
+                    executor.submit(self._report_issuer, issuer_code, signals_by_issuer[issuer_code]): issuer_code
+                    for issuer_code in prepared
+                }
+                for future in concurrent.futures.as_completed(future_to_issuer):
+                    issuer_code = future_to_issuer[future]
+                    try:
+                        results[issuer_code] = future.result()
+                    except Exception as e:
+                        print(f"Error analyzing issuer {issuer_code}: {str(e)}")
+                        results[issuer_code] = {"error": f"Failed to analyze issuer {issuer_code}"}
+            print(f"Indicator engine: {self.analyzer.engine.stats.summary()}")
+            self._cache_results(grouped_data, results)
+            return results
+        except Exception as e:
+            print(f"Error during panel analysis: {str(e)}")
+            return {"error": f"Panel analysis failed: {str(e)}"}
+
+
 @app.route('/analyze_all', methods=['GET'])
 def analyze_all_data():
     try:
         max_workers = int(request.args.get('max_workers', 4))
-        analyzer = BatchStockAnalyzer()
-        results = analyzer.analyze_batch(max_workers=max_workers)
+        # cache=0 recomputes and resends every issuer, not only those with new rows
+        cache = ResultCache() if request.args.get('cache', '1') != '0' else None
+        analyzer = BatchStockAnalyzer(cache)
+        try:
+            # mode=per_issuer runs the whole indicator pipeline separately for each issuer
+            if request.args.get('mode', 'panel') == 'per_issuer':
+                results = analyzer.analyze_batch(max_workers=max_workers)
+            else:
+                results = analyzer.analyze_panel(max_workers=max_workers)
+        finally:
+            if cache is not None:
+                cache.close()
         if isinstance(results, dict) and results.get("errors"):
             print("Processing errors:", results["errors"])
         return jsonify(results), 200 if not results.get("errors") else 207
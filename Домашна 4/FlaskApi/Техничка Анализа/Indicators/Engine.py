@@ -0,0 +1,283 @@
+import threading
+
+import pandas as pd
+import numpy as np
+from pandas.api.indexers import BaseIndexer
+
+from Indicators.MovingAverages import wma_values
+from Indicators.Oscillators import rolling_mad
+
+# An intermediate is a tuple (operation, *arguments); arguments that are tuples
+# are other intermediates, anything else is a parameter. Equal tuples are the
+# same intermediate, so rolling_max(column('Max Price'), 14) requested by both
+# the stochastic and Williams %R is one node of the graph and computed once.
+
+
+def column(name):
+    return ('column', name)
+
+
+def rolling_mean(source, window):
+    return ('rolling_mean', source, window)
+
+
+def rolling_max(source, window):
+    return ('rolling_max', source, window)
+
+
+def rolling_min(source, window):
+    return ('rolling_min', source, window)
+
+
+def ema(source, span):
+    return ('ema', source, span)
+
+
+def diff(source, periods=1):
+    return ('diff', source, periods)
+
+
+def wma(source, window):
+    return ('wma', source, window)
+
+
+def typical_price(high, low, close):
+    return ('typical_price', high, low, close)
+
+
+def price_range(high, low, period):
+    return ('price_range', rolling_max(high, period), rolling_min(low, period))
+
+
+def true_range(high, low, close):
+    return ('true_range', high, low, ('shift', close, 1))
+
+
+def sma(source, window):
+    return rolling_mean(source, window)
+
+
+def macd(source, fast=12, slow=26):
+    return ('difference', ema(source, fast), ema(source, slow))
+
+
+def hma(source, window):
+    raw_hma = ('hma_raw', wma(source, int(window / 2)), wma(source, window))
+    return wma(raw_hma, int(np.sqrt(window)))
+
+
+def rsi(source, period=14):
+    delta = diff(source)
+    return ('rsi', rolling_mean(('gain', delta), period), rolling_mean(('loss', delta), period))
+
+
+def stochastic_k(high, low, close, k_period=14):
+    return ('stochastic_k', close, rolling_min(low, k_period), price_range(high, low, k_period))
+
+
+def stochastic_d(high, low, close, k_period=14, d_period=3):
+    return rolling_mean(stochastic_k(high, low, close, k_period), d_period)
+
+
+def williams_r(high, low, close, period=14):
+    return ('williams_r', close, rolling_max(high, period), price_range(high, low, period))
+
+
+def cci(high, low, close, period=20):
+    tp = typical_price(high, low, close)
+    return ('cci', tp, rolling_mean(tp, period), ('rolling_mad', tp, period))
+
+
+def momentum(source, period=14):
+    return diff(source, period)
+
+
+def atr(high, low, close, period=14):
+    return rolling_mean(true_range(high, low, close), period)
+
+
+def price_change(source):
+    return ('pct_change', source)
+
+
+OPERATIONS = {
+    'rolling_mean': lambda series, window: series.rolling(window=window).mean(),
+    'rolling_max': lambda series, window: series.rolling(window=window).max(),
+    'rolling_min': lambda series, window: series.rolling(window=window).min(),
+    'ema': lambda series, span: series.ewm(span=span, adjust=False).mean(),
+    'diff': lambda series, periods: series.diff(periods),
+    'shift': lambda series, periods: series.shift(periods),
+    'pct_change': lambda series: series.pct_change(),
+    'wma': lambda series, window: pd.Series(wma_values(series.to_numpy(dtype=np.float64), window),
+                                            index=series.index),
+    'rolling_mad': lambda series, window: pd.Series(rolling_mad(series.to_numpy(dtype=np.float64), window),
+                                                    index=series.index),
+    'typical_price': lambda high, low, close: (high + low + close) / 3,
+    'true_range': lambda high, low, previous_close: pd.concat(
+        [high - low, abs(high - previous_close), abs(low - previous_close)], axis=1).max(axis=1),
+    'price_range': lambda highest_high, lowest_low: highest_high - lowest_low,
+    'difference': lambda left, right: left - right,
+    'hma_raw': lambda wma_half, wma_full: 2 * wma_half - wma_full,
+    'gain': lambda delta: delta.where(delta > 0, 0),
+    'loss': lambda delta: -delta.where(delta < 0, 0),
+    'rsi': lambda avg_gain, avg_loss: 100 - (100 / (1 + avg_gain / avg_loss)),
+    'stochastic_k': lambda close, lowest_low, price_range: 100 * ((close - lowest_low) / price_range),
+    'williams_r': lambda close, highest_high, price_range: -100 * ((highest_high - close) / price_range),
+    'cci': lambda tp, sma_tp, mad: (tp - sma_tp) / (0.015 * mad),
+}
+
+
+class SegmentWindowIndexer(BaseIndexer):
+    """Trailing windows of window_size rows that never reach back past series_start[row]."""
+
+    def get_window_bounds(self, num_values=0, min_periods=None, center=None, closed=None, step=None):
+        end = np.arange(1, num_values + 1, dtype=np.int64)
+        return np.maximum(end - self.window_size, self.series_start), end
+
+
+class Segments:
+    """Many issuers' series concatenated; series i owns rows offsets[i]:offsets[i + 1]."""
+
+    def __init__(self, offsets):
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        lengths = np.diff(self.offsets)
+        self.series_start = np.repeat(self.offsets[:-1], lengths)
+        self.groups = np.repeat(np.arange(len(lengths)), lengths)
+
+    def rolling(self, series, window):
+        # min_periods=window, as rolling(window) per series: the shortened
+        # windows at the start of a series give NaN.
+        return series.rolling(SegmentWindowIndexer(window_size=window, series_start=self.series_start),
+                              min_periods=window)
+
+    def within_series(self, series, periods):
+        """series with NaN wherever looking back periods rows would leave the row's own series."""
+        reaches_back = np.arange(len(series)) - periods < self.series_start
+        return series.mask(reaches_back)
+
+
+# Segmented counterparts of the OPERATIONS that look across rows, for
+# IndicatorEngine.compute_segmented. Each gives exactly what the per-series
+# operation gives on every series on its own: the pandas rolling kernels reset
+# at each series start, and elementwise lookbacks are masked where they would
+# cross into the previous series.
+SEGMENTED_OPERATIONS = {
+    'rolling_mean': lambda segments, series, window: segments.rolling(series, window).mean(),
+    'rolling_max': lambda segments, series, window: segments.rolling(series, window).max(),
+    'rolling_min': lambda segments, series, window: segments.rolling(series, window).min(),
+    'ema': lambda segments, series, span: pd.Series(
+        series.groupby(segments.groups, sort=False).ewm(span=span, adjust=False).mean().to_numpy(),
+        index=series.index),
+    'diff': lambda segments, series, periods: segments.within_series(series.diff(periods), periods),
+    'shift': lambda segments, series, periods: segments.within_series(series.shift(periods), periods),
+    'pct_change': lambda segments, series: series.groupby(segments.groups, sort=False).pct_change(),
+    'wma': lambda segments, series, window: pd.Series(
+        wma_values(series.to_numpy(dtype=np.float64), window, segments.offsets), index=series.index),
+    'rolling_mad': lambda segments, series, window: pd.Series(
+        rolling_mad(series.to_numpy(dtype=np.float64), window, segments.offsets), index=series.index),
+}
+
+
+def is_node(argument):
+    return isinstance(argument, tuple)
+
+
+def node_inputs(node):
+    return [argument for argument in node[1:] if is_node(argument)]
+
+
+def subgraph(node, nodes=None):
+    """The intermediates node depends on, itself included; column lookups are not computations."""
+    nodes = set() if nodes is None else nodes
+    if node[0] != 'column' and node not in nodes:
+        nodes.add(node)
+        for source in node_inputs(node):
+            subgraph(source, nodes)
+    return nodes
+
+
+class EngineStats:
+    def __init__(self):
+        self.series = 0
+        self.computed = 0
+        self.saved = 0
+        self.lock = threading.Lock()
+
+    def record(self, computed, saved, series=1):
+        with self.lock:
+            self.series += series
+            self.computed += computed
+            self.saved += saved
+
+    def summary(self):
+        total = self.computed + self.saved
+        share = 100 * self.saved / total if total else 0.0
+        return (f"{self.series} series, {self.computed} intermediates computed, "
+                f"{self.saved} of {total} ({share:.0f}%) saved by sharing")
+
+
+class IndicatorEngine:
+    """Computes a set of indicators over one series as a graph of shared intermediates.
+
+    indicators maps an output column to the node built by the constructors
+    above. The graph is ordered once, when the engine is created; compute()
+    then evaluates every distinct intermediate exactly once per frame, and
+    stats counts how many evaluations the independent indicator functions
+    would have repeated.
+    """
+
+    def __init__(self, indicators):
+        self.indicators = dict(indicators)
+        self.order = []
+        visited = set()
+        for node in self.indicators.values():
+            self.visit(node, visited)
+        self.planned = sum(1 for node in self.order if node[0] != 'column')
+        # What computing each output column on its own would evaluate.
+        self.unshared = sum(len(subgraph(node)) for node in self.indicators.values())
+        self.stats = EngineStats()
+
+    def visit(self, node, visited):
+        if node in visited:
+            return
+        if node[0] != 'column' and node[0] not in OPERATIONS:
+            raise ValueError(f"Unknown indicator operation: {node[0]}")
+        for source in node_inputs(node):
+            self.visit(source, visited)
+        visited.add(node)
+        self.order.append(node)
+
+    def compute(self, frame, segments=None):
+        """{output column: Series} for every requested indicator over frame."""
+        values = {}
+        for node in self.order:
+            if node[0] == 'column':
+                values[node] = frame[node[1]]
+                continue
+            arguments = [values[argument] if is_node(argument) else argument for argument in node[1:]]
+            if segments is not None and node[0] in SEGMENTED_OPERATIONS:
+                values[node] = SEGMENTED_OPERATIONS[node[0]](segments, *arguments)
+            else:
+                values[node] = OPERATIONS[node[0]](*arguments)
+        series = 1 if segments is None else len(segments.offsets) - 1
+        self.stats.record(self.planned, self.unshared - self.planned, series)
+        return {name: values[node] for name, node in self.indicators.items()}
+
+    def compute_segmented(self, frame, offsets):
+        """compute() for many series at once.
+
+        frame holds every issuer's rows back to back, issuer i in rows
+        offsets[i]:offsets[i + 1]; each intermediate is one call over all of
+        them, and the result for every issuer equals compute() on its rows alone.
+        """
+        return self.compute(frame, Segments(offsets))
+
+    def apply(self, frame, offsets=None):
+        """Adds every indicator to frame as a column, in the order they were declared.
+
+        With offsets, frame is a concatenation of series as for compute_segmented.
+        """
+        values = self.compute(frame) if offsets is None else self.compute_segmented(frame, offsets)
+        for name, series in values.items():
+            frame[name] = series
+        return frame